@@ -0,0 +1,151 @@
+# admision.py
+# Control de admisión y backpressure para /chat.
+# Limita las peticiones simultáneas, encola el exceso con un plazo máximo de espera
+# y reparte los huecos libres por turnos entre clientes, para que uno muy activo
+# no deje sin servicio al resto. Si no hay capacidad, se rechaza enseguida (429).
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+class AdmissionRejected(Exception):
+    """La petición no se admite; `retry_after` son los segundos sugeridos para reintentar."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(self, max_in_flight=8, max_queue=32, queue_timeout=10.0, max_per_client=4):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_client = max_per_client
+
+        self.in_flight = 0
+        self.queued = 0
+        self._active_by_client = {}
+        self._waiters = {}          # cliente -> deque de futures en espera
+        self._rotation = deque()    # orden de turno entre clientes con peticiones en cola
+        # Media móvil del tiempo de servicio, para estimar el Retry-After
+        self._avg_service_seconds = 1.0
+
+        self.admitted_total = 0
+        self.rejected_total = {"cola_llena": 0, "limite_cliente": 0, "plazo_vencido": 0}
+        self.max_queue_depth = 0
+
+    # --- Admisión ---
+
+    def _client_load(self, client_id):
+        return self._active_by_client.get(client_id, 0) + len(self._waiters.get(client_id, ()))
+
+    def _retry_after(self):
+        # Tiempo aproximado para que se vacíe la cola actual con la capacidad disponible
+        estimate = self._avg_service_seconds * (self.queued + 1) / self.max_in_flight
+        return max(1, math.ceil(estimate))
+
+    def _reject(self, reason):
+        self.rejected_total[reason] += 1
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _admit(self, client_id):
+        self.in_flight += 1
+        self._active_by_client[client_id] = self._active_by_client.get(client_id, 0) + 1
+        self.admitted_total += 1
+
+    async def acquire(self, client_id):
+        """Espera un hueco para `client_id` o lanza AdmissionRejected."""
+        if self._client_load(client_id) >= self.max_per_client:
+            self._reject("limite_cliente")
+
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self._admit(client_id)
+            return
+
+        if self.queued >= self.max_queue:
+            self._reject("cola_llena")
+
+        future = asyncio.get_running_loop().create_future()
+        if client_id not in self._waiters:
+            self._waiters[client_id] = deque()
+            self._rotation.append(client_id)
+        self._waiters[client_id].append(future)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Si el hueco ya se había concedido (en Python 3.12+ wait_for puede vencer después
+            # de que _grant_next resolviera el future), lo devolvemos
+            if future.done() and not future.cancelled():
+                self.release(client_id)
+            else:
+                self._remove_waiter(client_id, future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("plazo_vencido")
+
+    def _remove_waiter(self, client_id, future):
+        waiters = self._waiters.get(client_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self.queued -= 1
+            if not waiters:
+                del self._waiters[client_id]
+                self._rotation.remove(client_id)
+
+    def _grant_next(self):
+        """Concede los huecos libres por turnos (round-robin) entre los clientes en cola."""
+        while self.in_flight < self.max_in_flight and self._rotation:
+            client_id = self._rotation.popleft()
+            waiters = self._waiters[client_id]
+            future = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._rotation.append(client_id)
+            else:
+                del self._waiters[client_id]
+            if not future.done():
+                self._admit(client_id)
+                future.set_result(None)
+
+    def release(self, client_id, service_seconds=None):
+        self.in_flight -= 1
+        remaining = self._active_by_client.get(client_id, 1) - 1
+        if remaining:
+            self._active_by_client[client_id] = remaining
+        else:
+            self._active_by_client.pop(client_id, None)
+        if service_seconds is not None:
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, client_id):
+        """Context manager: admite la petición, y libera el hueco al terminar."""
+        await self.acquire(client_id)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(client_id, time.monotonic() - start)
+
+    # --- Métricas ---
+
+    def metrics(self):
+        return {
+            "en_curso": self.in_flight,
+            "en_cola": self.queued,
+            "max_en_curso": self.max_in_flight,
+            "max_en_cola": self.max_queue,
+            "profundidad_maxima_cola": self.max_queue_depth,
+            "clientes_activos": len(self._active_by_client),
+            "clientes_en_cola": len(self._waiters),
+            "admitidas_total": self.admitted_total,
+            "rechazadas_total": dict(self.rejected_total),
+            "tiempo_servicio_medio_s": round(self._avg_service_seconds, 3),
+        }
@@ -0,0 +1,229 @@
+# backend_embeddings.py
+# Backend de embeddings compartido por main.py y los scripts de ingesta.
+#   - "torch": sentence-transformers sobre PyTorch (el comportamiento de siempre).
+#   - "onnx":  el mismo modelo exportado a ONNX Runtime con cuantización dinámica int8,
+#              bastante más rápido en los nodos sólo-CPU.
+# Chroma guarda los vectores en float32. Opcionalmente cada versión del índice guarda además
+# una copia compacta en float16/int8 (vectores_compactos.npz) con la que main.py reordena
+# los candidatos de Chroma.
+
+import json
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# --- 1. Configuración ---
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+ONNX_MODELS_DIR = os.getenv("ONNX_MODELS_DIR", "modelos_onnx")
+# Longitud máxima de secuencia de all-MiniLM-L6-v2 en sentence-transformers
+MAX_SEQ_LENGTH = 256
+BATCH_SIZE = 32
+
+BACKENDS = ("torch", "onnx")
+PRECISIONS = ("float32", "float16", "int8")
+# Archivo que cada versión del índice guarda con la configuración con la que se construyó
+INDEX_CONFIG_FILE = "embeddings.json"
+# Copia compacta de los vectores (sólo si la precisión no es float32)
+COMPACT_VECTORS_FILE = "vectores_compactos.npz"
+
+# --- 2. Backend ONNX Runtime ---
+
+class OnnxEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 en ONNX Runtime con cuantización dinámica int8 (mean pooling + normalización L2)."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, models_dir=ONNX_MODELS_DIR):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.join(models_dir, f"{model_name}-int8")
+        if not os.path.exists(os.path.join(model_dir, "model_quantized.onnx")):
+            export_quantized_onnx(model_name, model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name="model_quantized.onnx")
+
+    def _embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            batch = texts[start:start + BATCH_SIZE]
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            vectors.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        return np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
+
+def export_quantized_onnx(model_name, model_dir):
+    """Exporta el modelo (desde la caché local de Hugging Face) a ONNX y lo cuantiza dinámicamente a int8."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    print(f"Exportando '{repo_id}' a ONNX y cuantizando a int8 en '{model_dir}'...")
+    model = ORTModelForFeatureExtraction.from_pretrained(repo_id, export=True)
+    model.save_pretrained(model_dir)
+    AutoTokenizer.from_pretrained(repo_id).save_pretrained(model_dir)
+
+    quantizer = ORTQuantizer.from_pretrained(model_dir)
+    # Cuantización dinámica: los pesos se guardan en int8 y las activaciones se cuantizan al vuelo
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+
+# --- 3. Fábrica ---
+
+def create_embeddings(backend=None, model_name=EMBEDDING_MODEL):
+    """Crea el objeto Embeddings de LangChain para el backend indicado (o el de EMBEDDING_BACKEND)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de embeddings desconocido: '{backend}'. Opciones: {', '.join(BACKENDS)}.")
+
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+# --- 4. Configuración asociada a cada versión del índice ---
+
+def save_index_config(index_path, backend=None, precision=None, model_name=EMBEDDING_MODEL):
+    """Guarda junto al índice con qué backend y precisión se construyó, para que las consultas usen los mismos."""
+    config = {
+        "modelo": model_name,
+        "backend": backend or EMBEDDING_BACKEND,
+        "precision": precision or EMBEDDING_PRECISION,
+    }
+    with open(os.path.join(index_path, INDEX_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    return config
+
+def load_index_config(index_path):
+    """Configuración con la que se construyó un índice; los índices antiguos usan torch/float32."""
+    try:
+        with open(os.path.join(index_path, INDEX_CONFIG_FILE), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        config = {"modelo": EMBEDDING_MODEL, "backend": "torch"}
+    config.setdefault("precision", "float32")
+    return config
+
+# --- 5. Vectores en precisión reducida ---
+
+def quantize_vectors(vectors, precision):
+    """
+    Convierte una matriz de vectores a la precisión indicada. Devuelve (datos, escalas):
+    en int8 se usa una escala por vector (simétrica); en el resto, escalas es None.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales).astype(np.int8), scales.astype(np.float32)
+    return vectors, None
+
+def dequantize_vectors(data, scales=None):
+    data = data.astype(np.float32)
+    return data * scales if scales is not None else data
+
+class CompactVectors:
+    """
+    Vectores de los documentos de una versión del índice en float16/int8, indexados por el id de
+    Chroma. Se guardan en COMPACT_VECTORS_FILE junto al índice y ocupan 2-4 veces menos que en float32.
+    """
+
+    def __init__(self, ids, data, scales, precision):
+        self.precision = precision
+        self._set(list(ids), data, scales)
+
+    def _set(self, ids, data, scales):
+        self.ids = ids
+        self.data = data
+        self.scales = scales
+        self._positions = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    @classmethod
+    def from_vectors(cls, ids, vectors, precision):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        data, scales = quantize_vectors(vectors, precision)
+        return cls(ids, data, scales, precision)
+
+    @classmethod
+    def load(cls, index_path):
+        """Lee la copia compacta de un índice; None si el índice no tiene."""
+        path = os.path.join(index_path, COMPACT_VECTORS_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as f:
+            scales = f["escalas"] if f["escalas"].size else None
+            return cls(f["ids"].tolist(), f["datos"], scales, str(f["precision"]))
+
+    def save(self, index_path):
+        np.savez(
+            os.path.join(index_path, COMPACT_VECTORS_FILE),
+            ids=np.array(self.ids, dtype=str),
+            datos=self.data,
+            escalas=self.scales if self.scales is not None else np.zeros((0, 1), dtype=np.float32),
+            precision=np.array(self.precision),
+        )
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def remove(self, ids):
+        """Quita los vectores de `ids` (los que no estén se ignoran)."""
+        drop = {self._positions[doc_id] for doc_id in ids if doc_id in self._positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        scales = self.scales[keep] if self.scales is not None else None
+        self._set([self.ids[i] for i in keep], self.data[keep], scales)
+
+    def add(self, ids, vectors):
+        """Añade (o reemplaza) los vectores float32 de `ids`."""
+        self.remove(ids)
+        new = CompactVectors.from_vectors(ids, vectors, self.precision)
+        if not self.ids:
+            self._set(new.ids, new.data, new.scales)
+            return
+        scales = np.vstack([self.scales, new.scales]) if self.scales is not None else None
+        self._set(self.ids + new.ids, np.vstack([self.data, new.data]), scales)
+
+    def scores(self, ids, query_vector):
+        """Similitud (producto escalar; los vectores vienen normalizados) de la consulta con cada id; None si no está."""
+        positions = [self._positions.get(doc_id) for doc_id in ids]
+        rows = [p for p in positions if p is not None]
+        if not rows:
+            return [None] * len(ids)
+        vectors = dequantize_vectors(self.data[rows], self.scales[rows] if self.scales is not None else None)
+        values = iter((vectors @ np.asarray(query_vector, dtype=np.float32)).tolist())
+        return [next(values) if p is not None else None for p in positions]
+
+def save_compact_vectors(db, index_path, precision, removed_ids=None, added_ids=None):
+    """
+    Escribe la copia compacta de un índice a partir de los vectores float32 de Chroma (`db`).
+    Con `removed_ids`/`added_ids` actualiza la copia que ya tenga el índice en lugar de rehacerla;
+    con precisión float32 no hay copia que guardar.
+    """
+    if precision == "float32":
+        return None
+    store = CompactVectors.load(index_path) if removed_ids is not None or added_ids is not None else None
+    if store is None or store.precision != precision:
+        existing = db.get(include=["embeddings"])
+        store = CompactVectors.from_vectors(existing["ids"], existing["embeddings"], precision)
+    else:
+        store.remove(removed_ids or [])
+        if added_ids:
+            new = db.get(ids=list(added_ids), include=["embeddings"])
+            store.add(new["ids"], new["embeddings"])
+    store.save(index_path)
+    print(f"Vectores compactos ({precision}): {len(store.ids)} documentos, {store.nbytes / 1024:.1f} KB.")
+    return store
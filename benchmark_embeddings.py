@@ -0,0 +1,122 @@
+# benchmark_embeddings.py
+# Compara los backends de embeddings de backend_embeddings.py (torch / onnx int8) y las
+# precisiones de los vectores (float32 / float16 / int8) sobre el corpus real: latencia
+# por consulta, documentos/segundo, bytes por vector y pérdida de recall@k frente a los
+# embeddings actuales (torch, float32). Las precisiones reducidas usan la misma
+# cuantización que la copia compacta que guardan los scripts de ingesta (--precision).
+
+import argparse
+import json
+import random
+import statistics
+import time
+import numpy as np
+from backend_embeddings import BACKENDS, PRECISIONS, create_embeddings, quantize_vectors, dequantize_vectors
+from ingest_chroma import load_and_prepare_documents
+
+BASELINE = ("torch", "float32")
+# Mismo k que el retriever de main.py
+DEFAULT_K = 4
+
+def top_k(doc_vectors, query_vectors, k):
+    """Índices de los k documentos más similares (coseno; los vectores ya vienen normalizados) para cada consulta."""
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def recall_at_k(results, reference):
+    """Fracción de los top-k de referencia que aparecen en los top-k obtenidos, promediada por consulta."""
+    hits = [len(set(r) & set(ref)) / len(ref) for r, ref in zip(results, reference)]
+    return statistics.mean(hits)
+
+def self_hit_rate(results, query_doc_ids):
+    """Fracción de consultas (títulos) cuyo propio trámite aparece en el top-k."""
+    return statistics.mean(1.0 if doc_id in r else 0.0 for r, doc_id in zip(results, query_doc_ids))
+
+def run_backend(backend, texts, queries):
+    """Carga el backend, embebe el corpus y las consultas, y mide los tiempos."""
+    print(f"\n=== Backend {backend} ===")
+    start = time.perf_counter()
+    embeddings = create_embeddings(backend)
+    load_seconds = time.perf_counter() - start
+
+    # Calentamiento: la primera llamada incluye inicializaciones perezosas
+    embeddings.embed_query("calentamiento")
+
+    start = time.perf_counter()
+    doc_vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    docs_seconds = time.perf_counter() - start
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    stats = {
+        "carga_modelo_s": round(load_seconds, 2),
+        "docs_por_segundo": round(len(texts) / docs_seconds, 1),
+        "consulta_ms_media": round(statistics.mean(latencies), 2),
+        "consulta_ms_p50": round(latencies[len(latencies) // 2], 2),
+        "consulta_ms_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+    print(f"  Carga: {stats['carga_modelo_s']}s | {stats['docs_por_segundo']} docs/s | "
+          f"consulta p50 {stats['consulta_ms_p50']} ms, p95 {stats['consulta_ms_p95']} ms")
+    return stats, doc_vectors, np.asarray(query_vectors, dtype=np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara latencia, throughput y recall de los backends y precisiones de embeddings.",
+        epilog="Ejemplo: python benchmark_embeddings.py --consultas 200 --salida benchmark_embeddings.json"
+    )
+    parser.add_argument("--backends", nargs='+', choices=BACKENDS, default=list(BACKENDS), help="Backends a comparar.")
+    parser.add_argument("--consultas", type=int, default=100, help="Número de consultas (títulos de trámites) a medir.")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help=f"Documentos recuperados por consulta (por defecto {DEFAULT_K}).")
+    parser.add_argument("--salida", help="Ruta opcional para guardar los resultados en JSON.")
+    args = parser.parse_args()
+
+    documents = load_and_prepare_documents()
+    if not documents:
+        print("No hay documentos para el benchmark. Finalizando.")
+        return
+    texts = [doc.page_content for doc in documents]
+    # Consultas: los nombres de una muestra de trámites (cada una tiene un documento "correcto")
+    query_doc_ids = random.Random(0).sample(range(len(documents)), min(args.consultas, len(documents)))
+    queries = [documents[i].metadata["nombre_tramite"] for i in query_doc_ids]
+
+    backends = [BASELINE[0]] + [b for b in args.backends if b != BASELINE[0]]
+    report, reference = {}, None
+    for backend in backends:
+        stats, doc_vectors, query_vectors = run_backend(backend, texts, queries)
+        for precision in PRECISIONS:
+            data, scales = quantize_vectors(doc_vectors, precision)
+            stored = dequantize_vectors(data, scales)
+            results = top_k(stored, query_vectors, args.k)
+            if (backend, precision) == BASELINE:
+                reference = results
+            bytes_per_vector = (data.nbytes + (scales.nbytes if scales is not None else 0)) / len(texts)
+            report[f"{backend}/{precision}"] = {
+                **stats,
+                "bytes_por_vector": round(bytes_per_vector, 1),
+                f"recall@{args.k}": round(recall_at_k(results, reference), 4),
+                "acierto_titulo": round(self_hit_rate(results, query_doc_ids), 4),
+            }
+
+    base = report[f"{BASELINE[0]}/{BASELINE[1]}"]
+    print(f"\n--- Resumen ({len(texts)} documentos, {len(queries)} consultas, k={args.k}) ---")
+    print(f"{'Config.':<16}{'Docs/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'Bytes/vec':>11}{f'Recall@{args.k}':>11}{'Acierto':>9}")
+    for label, r in report.items():
+        print(f"{label:<16}{r['docs_por_segundo']:>9}{r['consulta_ms_p50']:>10}{r['consulta_ms_p95']:>10}"
+              f"{r['bytes_por_vector']:>11}{r[f'recall@{args.k}']:>11}{r['acierto_titulo']:>9}")
+    for label, r in report.items():
+        if label.endswith("/float32") and r is not base:
+            print(f"\n{label}: {r['docs_por_segundo'] / base['docs_por_segundo']:.2f}x docs/s, "
+                  f"{base['consulta_ms_p50'] / r['consulta_ms_p50']:.2f}x más rápido por consulta (p50).")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"Resultados guardados en '{args.salida}'.")
+
+if __name__ == "__main__":
+    main()
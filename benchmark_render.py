@@ -0,0 +1,148 @@
+# benchmark_render.py
+# Compara el tiempo de carga y los bytes transferidos por página con y sin el
+# "render ligero" de render_ligero.py, usando una muestra de URLs reales de gob.ec.
+
+import argparse
+import json
+import statistics
+import time
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from render_ligero import apply_lean_options, block_heavy_resources
+
+URLS_CHECKPOINT_FILE = "urls_encontradas.json"
+SEARCH_SAMPLE_URL = "https://www.gob.ec/tramites/buscar?search_api_fulltext=cedula&page=0"
+# La red se considera inactiva tras este tiempo sin peticiones pendientes
+NETWORK_IDLE_SECONDS = 0.5
+NETWORK_IDLE_TIMEOUT = 30
+NETWORK_POLL_SECONDS = 0.1
+
+def create_benchmark_driver(lean_render):
+    """Crea un driver con el log de rendimiento de DevTools activado y la caché desactivada."""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if lean_render:
+        apply_lean_options(chrome_options)
+
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    driver.set_page_load_timeout(45)
+    driver.execute_cdp_cmd("Network.enable", {})
+    # Sin caché, para que cada carga refleje el coste real de red
+    driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+    if lean_render:
+        block_heavy_resources(driver)
+    return driver
+
+def bytes_transferred(driver, timeout=NETWORK_IDLE_TIMEOUT):
+    """
+    Lee el log de DevTools hasta que la red queda inactiva (ninguna petición pendiente durante
+    NETWORK_IDLE_SECONDS) y devuelve los bytes recibidos (encodedDataLength) en esa carga.
+    Con la carga "eager" del modo ligero, driver.get vuelve antes de que terminen todas las
+    peticiones; sin esta espera sus bytes se contarían en la página siguiente.
+    """
+    pending = set()
+    total = 0
+    idle_since = None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method, params = message.get("method"), message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                pending.add(params["requestId"])
+            elif method == "Network.loadingFinished":
+                pending.discard(params["requestId"])
+                total += params.get("encodedDataLength", 0)
+            elif method == "Network.loadingFailed":
+                # Incluye las peticiones bloqueadas por el render ligero
+                pending.discard(params["requestId"])
+
+        if pending:
+            idle_since = None
+        elif idle_since is None:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= NETWORK_IDLE_SECONDS:
+            return total
+        time.sleep(NETWORK_POLL_SECONDS)
+
+    print(f"  -> Aviso: {len(pending)} peticiones sin terminar tras {timeout}s; no se cuentan sus bytes.")
+    return total
+
+def run_mode(urls, lean_render):
+    """Carga cada URL en un navegador nuevo del modo indicado y devuelve las mediciones."""
+    driver = create_benchmark_driver(lean_render)
+    results = []
+    try:
+        # Página de calentamiento para no medir el arranque del navegador
+        driver.get("about:blank")
+        bytes_transferred(driver)
+
+        for url in urls:
+            start = time.perf_counter()
+            try:
+                driver.get(url)
+            except Exception as e:
+                print(f"  -> Error cargando {url}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            size = bytes_transferred(driver)
+            results.append({"url": url, "segundos": elapsed, "bytes": size})
+            print(f"  {elapsed:6.2f}s  {size / 1024:9.1f} KB  {url.split('/')[-1]}")
+    finally:
+        driver.quit()
+    return results
+
+def summarize(results):
+    if not results:
+        return {"paginas": 0}
+    times = [r["segundos"] for r in results]
+    sizes = [r["bytes"] for r in results]
+    return {
+        "paginas": len(results),
+        "segundos_media": statistics.mean(times),
+        "segundos_mediana": statistics.median(times),
+        "kb_media": statistics.mean(sizes) / 1024,
+        "kb_total": sum(sizes) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara tiempo de carga y bytes transferidos con y sin render ligero.",
+        epilog="Ejemplo: python benchmark_render.py --muestras 10 --salida benchmark_render.json"
+    )
+    parser.add_argument("--muestras", type=int, default=10, help="Número de páginas de trámites a cargar.")
+    parser.add_argument("--salida", help="Ruta opcional para guardar los resultados en JSON.")
+    args = parser.parse_args()
+
+    with open(URLS_CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+        urls = [SEARCH_SAMPLE_URL] + json.load(f)[:args.muestras]
+
+    report = {}
+    for label, lean_render in (("completo", False), ("ligero", True)):
+        print(f"\n=== Modo {label} ===")
+        results = run_mode(urls, lean_render)
+        report[label] = {"resumen": summarize(results), "paginas": results}
+
+    full, lean = report["completo"]["resumen"], report["ligero"]["resumen"]
+    print("\n--- Resumen ---")
+    print(f"{'Modo':<10}{'Páginas':>9}{'Media (s)':>12}{'Mediana (s)':>14}{'KB/página':>12}")
+    for label in ("completo", "ligero"):
+        r = report[label]["resumen"]
+        if r["paginas"]:
+            print(f"{label:<10}{r['paginas']:>9}{r['segundos_media']:>12.2f}{r['segundos_mediana']:>14.2f}{r['kb_media']:>12.1f}")
+    if full.get("paginas") and lean.get("paginas"):
+        print(f"\nAhorro de tiempo medio: {100 * (1 - lean['segundos_media'] / full['segundos_media']):.1f}%")
+        print(f"Ahorro de bytes por página: {100 * (1 - lean['kb_media'] / full['kb_media']):.1f}%")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"Resultados guardados en '{args.salida}'.")
+
+if __name__ == "__main__":
+    main()
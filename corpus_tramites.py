@@ -0,0 +1,241 @@
+# corpus_tramites.py
+# Almacén compacto del corpus de trámites en SQLite.
+# Sustituye a los JSON con indent=4 como formato canónico: los scrapers escriben aquí,
+# la ingesta lo recorre en streaming y main.py consulta un trámite por su URL_Fuente
+# sin cargar el resto. Cada campo se guarda por separado (comprimido si es largo)
+# y sólo se decodifica cuando se lee.
+
+import argparse
+import json
+import sqlite3
+import threading
+import zlib
+from collections.abc import Mapping
+
+# --- 1. Configuración ---
+CORPUS_DB_PATH = "tramites_corpus.db"
+# Los valores más cortos que esto se guardan sin comprimir (zlib no compensa)
+COMPRESS_MIN_BYTES = 64
+_RAW, _ZLIB = b"t", b"z"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nombres_campo (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tramites (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS campos (
+    tramite_id INTEGER NOT NULL REFERENCES tramites(id) ON DELETE CASCADE,
+    campo_id INTEGER NOT NULL REFERENCES nombres_campo(id),
+    valor BLOB,
+    PRIMARY KEY (tramite_id, campo_id)
+) WITHOUT ROWID;
+"""
+
+def _encode(value):
+    data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(data, 6)
+    return _RAW + data
+
+def _decode(blob):
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == _ZLIB else blob[1:]
+    return json.loads(data.decode("utf-8"))
+
+class TramiteRecord(Mapping):
+    """Vista de sólo lectura de un trámite; cada campo se lee y decodifica al accederlo."""
+
+    def __init__(self, corpus, tramite_id, url, field_names):
+        self._corpus = corpus
+        self._tramite_id = tramite_id
+        self._field_names = field_names
+        self._cache = {"URL_Fuente": url}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            if name not in self._field_names:
+                raise KeyError(name)
+            self._cache[name] = self._corpus._read_field(self._tramite_id, name)
+        return self._cache[name]
+
+    def __iter__(self):
+        return iter(self._field_names)
+
+    def __len__(self):
+        return len(self._field_names)
+
+    def to_dict(self):
+        return {name: self[name] for name in self._field_names}
+
+class CorpusTramites:
+    """Corpus de trámites en SQLite, indexado por URL_Fuente."""
+
+    def __init__(self, path=CORPUS_DB_PATH, readonly=False):
+        self.path = path
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        # Una sola conexión compartida entre hilos (p. ej. el threadpool de FastAPI)
+        self._lock = threading.Lock()
+        self._load_field_names()
+
+    def _load_field_names(self):
+        self._field_names = dict(self._conn.execute("SELECT id, nombre FROM nombres_campo"))
+        self._field_ids = {nombre: field_id for field_id, nombre in self._field_names.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    # --- Escritura ---
+
+    def _field_id(self, name):
+        if name not in self._field_ids:
+            cursor = self._conn.execute("INSERT INTO nombres_campo (nombre) VALUES (?)", (name,))
+            self._field_ids[name] = cursor.lastrowid
+            self._field_names[cursor.lastrowid] = name
+        return self._field_ids[name]
+
+    def _put(self, tramite):
+        url = tramite.get("URL_Fuente")
+        if not url:
+            return False
+        self._conn.execute("DELETE FROM tramites WHERE url = ?", (url,))
+        tramite_id = self._conn.execute("INSERT INTO tramites (url) VALUES (?)", (url,)).lastrowid
+        self._conn.executemany(
+            "INSERT INTO campos (tramite_id, campo_id, valor) VALUES (?, ?, ?)",
+            [(tramite_id, self._field_id(name), _encode(value)) for name, value in tramite.items()]
+        )
+        return True
+
+    def put(self, tramite):
+        """Inserta o reemplaza un trámite (dict con URL_Fuente)."""
+        with self._lock, self._conn:
+            return self._put(tramite)
+
+    def put_many(self, tramites):
+        """Inserta o reemplaza varios trámites en una sola transacción. Devuelve cuántos se guardaron."""
+        with self._lock, self._conn:
+            return sum(1 for tramite in tramites if isinstance(tramite, dict) and self._put(tramite))
+
+    def compact(self):
+        """Reescribe el archivo para recuperar el espacio de los registros reemplazados."""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def delete(self, url):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tramites WHERE url = ?", (url,))
+
+    # --- Lectura ---
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tramites").fetchone()[0]
+
+    def __contains__(self, url):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM tramites WHERE url = ?", (url,)).fetchone() is not None
+
+    def urls(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT url FROM tramites ORDER BY id")]
+
+    def get(self, url):
+        """Devuelve un TramiteRecord perezoso para `url`, o None si no existe."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM tramites WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            field_ids = self._conn.execute(
+                "SELECT campo_id FROM campos WHERE tramite_id = ? ORDER BY campo_id", (row[0],)
+            ).fetchall()
+            if any(field_id not in self._field_names for (field_id,) in field_ids):
+                # Otro proceso (p. ej. un scraper) añadió campos nuevos desde que abrimos el corpus
+                self._load_field_names()
+        return TramiteRecord(self, row[0], url, [self._field_names[field_id] for (field_id,) in field_ids])
+
+    def _read_field(self, tramite_id, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT valor FROM campos WHERE tramite_id = ? AND campo_id = ?",
+                (tramite_id, self._field_ids[name])
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def __iter__(self):
+        """Recorre todos los trámites como dicts, en streaming y en orden de inserción."""
+        # Conexión propia para no retener el lock mientras quien itera procesa cada trámite
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            field_names = dict(conn.execute("SELECT id, nombre FROM nombres_campo"))
+            rows = conn.execute(
+                "SELECT tramite_id, campo_id, valor FROM campos ORDER BY tramite_id, campo_id"
+            )
+            current_id, tramite = None, None
+            for tramite_id, field_id, valor in rows:
+                if tramite_id != current_id:
+                    if tramite is not None:
+                        yield tramite
+                    current_id, tramite = tramite_id, {}
+                tramite[field_names[field_id]] = _decode(valor)
+            if tramite is not None:
+                yield tramite
+        finally:
+            conn.close()
+
+# --- 2. Conversores desde/hacia JSON ---
+
+def json_to_corpus(json_path, db_path=CORPUS_DB_PATH):
+    """Importa un archivo JSON de trámites (lista de dicts) al corpus."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        tramites = json.load(f)
+    with CorpusTramites(db_path) as corpus:
+        saved = corpus.put_many(tramites)
+        total = len(corpus)
+        corpus.compact()
+    print(f"Se importaron {saved} trámites de '{json_path}' a '{db_path}' ({total} en total).")
+    return saved
+
+def corpus_to_json(json_path, db_path=CORPUS_DB_PATH):
+    """Exporta el corpus completo al formato JSON de siempre."""
+    with CorpusTramites(db_path, readonly=True) as corpus:
+        tramites = list(corpus)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(tramites, f, ensure_ascii=False, indent=4)
+    print(f"Se exportaron {len(tramites)} trámites de '{db_path}' a '{json_path}'.")
+    return len(tramites)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convierte el corpus de trámites entre JSON y el formato compacto SQLite.",
+        epilog="Ejemplo: python corpus_tramites.py importar tramites_extraidos_LISTA.json"
+    )
+    parser.add_argument("--db", default=CORPUS_DB_PATH, help=f"Ruta del corpus SQLite (por defecto {CORPUS_DB_PATH}).")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    importar = subparsers.add_parser("importar", help="Añade uno o más archivos JSON al corpus.")
+    importar.add_argument("json_files", nargs='+', help="Archivos JSON de trámites.")
+    exportar = subparsers.add_parser("exportar", help="Exporta el corpus a un archivo JSON.")
+    exportar.add_argument("json_file", help="Archivo JSON de salida.")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        for json_file in args.json_files:
+            json_to_corpus(json_file, args.db)
+    elif args.comando == "exportar":
+        corpus_to_json(args.json_file, args.db)
+
+if __name__ == "__main__":
+    main()
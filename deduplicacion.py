@@ -0,0 +1,118 @@
+# deduplicacion.py
+# Detección de casi-duplicados con MinHash + LSH (Locality Sensitive Hashing).
+# El mismo trámite aparece a veces bajo varias instituciones o slugs con un texto casi idéntico;
+# aquí los agrupamos para indexar una sola copia canónica.
+
+import re
+import unicodedata
+import zlib
+import numpy as np
+
+# --- 1. Configuración ---
+NUM_PERM = 128           # Número de permutaciones (tamaño de la firma MinHash)
+BANDS = 16               # Bandas LSH; BANDS * ROWS debe ser NUM_PERM
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3         # Tamaño de los n-gramas de palabras
+DEFAULT_THRESHOLD = 0.8  # Similitud de Jaccard estimada a partir de la cual dos textos son duplicados
+# Muchos trámites distintos comparten plantilla y sólo cambian una palabra del título
+# (análisis de laboratorio de la ARCFZ, variantes "persona natural"/"persona jurídica"),
+# así que exigimos además que los títulos normalizados tengan las mismas palabras.
+TITLE_THRESHOLD = 1.0
+# Máximo de miembros de un bucket con los que se compara cada documento nuevo.
+# Acota el trabajo por documento y mantiene el coste total lineal en el tamaño del corpus.
+# Cuando se exige el mismo título (TITLE_THRESHOLD = 1.0), el título forma parte de la clave
+# del bucket: así una familia de trámites con la misma plantilla no llena el bucket y el
+# límite sólo se aplica entre candidatos con el mismo título.
+MAX_BUCKET_COMPARISONS = 5
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+# --- 2. Firmas MinHash ---
+
+def normalize_text(text):
+    """Minúsculas, sin tildes y sólo palabras alfanuméricas."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Conjunto de n-gramas de palabras, como hashes de 32 bits."""
+    words = normalize_text(text)
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text):
+    """Firma MinHash de NUM_PERM valores usando permutaciones (a*x + b) mod p."""
+    values = np.fromiter(shingles(text), dtype=np.uint64) % _MERSENNE_PRIME
+    hashed = (values[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+    return hashed.min(axis=0)
+
+def estimated_jaccard(sig_a, sig_b):
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+def title_similarity(words_a, words_b):
+    """Jaccard exacto entre los conjuntos de palabras de dos títulos."""
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+# --- 3. Agrupamiento con LSH ---
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+def find_duplicate_clusters(texts, titles=None, threshold=DEFAULT_THRESHOLD, title_threshold=TITLE_THRESHOLD):
+    """
+    Agrupa los textos casi duplicados. Devuelve una lista de clusters (listas de índices),
+    incluidos los de un solo elemento, en el orden de aparición de su primer miembro.
+    Si se pasan `titles`, dos textos sólo se consideran duplicados si sus títulos también lo son.
+    """
+    signatures = [minhash_signature(text) for text in texts]
+    title_words = [set(normalize_text(title)) for title in titles] if titles is not None else None
+
+    def is_duplicate(i, j):
+        if estimated_jaccard(signatures[i], signatures[j]) < threshold:
+            return False
+        return title_words is None or title_similarity(title_words[i], title_words[j]) >= title_threshold
+
+    # Con títulos idénticos como requisito, sólo compiten en un bucket los documentos con el mismo título
+    title_keys = (
+        [" ".join(sorted(words)) for words in title_words]
+        if title_words is not None and title_threshold >= 1.0 else None
+    )
+
+    buckets = [{} for _ in range(BANDS)]
+    union_find = _UnionFind(len(texts))
+
+    for i, signature in enumerate(signatures):
+        for band, band_buckets in enumerate(buckets):
+            key = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+            if title_keys is not None:
+                key = (title_keys[i], key)
+            members = band_buckets.setdefault(key, [])
+            for j in members:
+                if union_find.find(i) != union_find.find(j) and is_duplicate(i, j):
+                    union_find.union(i, j)
+            if len(members) < MAX_BUCKET_COMPARISONS:
+                members.append(i)
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(union_find.find(i), []).append(i)
+    return list(clusters.values())
@@ -5,15 +5,19 @@
 import json
 from bs4 import BeautifulSoup
 from langchain.docstore.document import Document
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
+import argparse
 import os
-import shutil
+import time
+from versiones_indice import new_version_path, publish, discard
+from corpus_tramites import CORPUS_DB_PATH, CorpusTramites
+from perfilador import IngestionProfiler, build_vector_store
+from backend_embeddings import (
+    BACKENDS, EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_PRECISION, PRECISIONS,
+    create_embeddings, save_compact_vectors, save_index_config
+)
 
 # --- 1. Configuración ---
 JSON_FILE_PATH = "tramites_extraidos_COMPLETO.json"
-CHROMA_DB_PATH = "tramites_chroma_db"
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
 def clean_html(html_content):
     """
@@ -27,8 +31,8 @@ def clean_html(html_content):
     # Si no es HTML, asegúrate de que sea una cadena de texto limpia
     return str(html_content).strip() if html_content else "No disponible"
 
-def load_and_prepare_documents():
-    """Carga los trámites desde el JSON y los prepara como documentos de LangChain."""
+def load_json_tramites():
+    """Carga los trámites desde el archivo JSON (formato anterior al corpus compacto)."""
     try:
         with open(JSON_FILE_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -41,35 +45,37 @@ def load_and_prepare_documents():
     except json.JSONDecodeError:
         print(f"Error: El archivo '{JSON_FILE_PATH}' no es un JSON válido.")
         return []
+    return data
 
-    documents = []
-    print(f"Procesando {len(data)} trámites desde el archivo JSON...")
-
-    for tramite in data:
-        # --- MODIFICADO: Limpieza individual y exhaustiva de cada campo ---
-        # Se limpian todos los campos que potencialmente contienen HTML o necesitan formateo.
-        
-        # Diccionario para almacenar los textos limpios y evitar repeticiones de .get()
-        cleaned_text = {
-            "Nombre_Tramite": tramite.get("Nombre_Tramite", "No disponible"),
-            "Institucion_Responsable": tramite.get("Institucion_Responsable", "No disponible"),
-            "URL_Fuente": tramite.get("URL_Fuente", "No disponible"),
-            "Descripcion": clean_html(tramite.get("Descripcion")),
-            "A_Quien_Dirigido": clean_html(tramite.get("A_Quien_Dirigido")),
-            "Que_Obtendre": clean_html(tramite.get("Que_Obtendre")),
-            "Requisitos": clean_html(tramite.get("Requisitos")),
-            "Como_Hacer_Tramite": clean_html(tramite.get("Como_Hacer_Tramite")),
-            "Costo": clean_html(tramite.get("Costo")),
-            "Ubicacion_Horarios": clean_html(tramite.get("Ubicacion_Horarios")),
-            "Base_Legal": clean_html(tramite.get("Base_Legal")),
-            "Fecha_Actualizacion": tramite.get("Fecha_Actualizacion", "No disponible"),
-            "Canales_Atencion": clean_html(tramite.get("Canales_Atencion"))
-        }
-
-        # --- MODIFICADO: Formato de `page_content` mucho más completo y legible ---
-        # Se estructura la información con títulos claros para que el LLM pueda entender
-        # el contexto de cada pieza de información.
-        page_content = f"""
+def clean_tramite(tramite):
+    """Limpia los campos de un trámite y devuelve un diccionario de textos listos para el documento."""
+    # --- MODIFICADO: Limpieza individual y exhaustiva de cada campo ---
+    # Se limpian todos los campos que potencialmente contienen HTML o necesitan formateo.
+    
+    # Diccionario para almacenar los textos limpios y evitar repeticiones de .get()
+    cleaned_text = {
+        "Nombre_Tramite": tramite.get("Nombre_Tramite", "No disponible"),
+        "Institucion_Responsable": tramite.get("Institucion_Responsable", "No disponible"),
+        "URL_Fuente": tramite.get("URL_Fuente", "No disponible"),
+        "Descripcion": clean_html(tramite.get("Descripcion")),
+        "A_Quien_Dirigido": clean_html(tramite.get("A_Quien_Dirigido")),
+        "Que_Obtendre": clean_html(tramite.get("Que_Obtendre")),
+        "Requisitos": clean_html(tramite.get("Requisitos")),
+        "Como_Hacer_Tramite": clean_html(tramite.get("Como_Hacer_Tramite")),
+        "Costo": clean_html(tramite.get("Costo")),
+        "Ubicacion_Horarios": clean_html(tramite.get("Ubicacion_Horarios")),
+        "Base_Legal": clean_html(tramite.get("Base_Legal")),
+        "Fecha_Actualizacion": tramite.get("Fecha_Actualizacion", "No disponible"),
+        "Canales_Atencion": clean_html(tramite.get("Canales_Atencion"))
+    }
+    return cleaned_text
+
+def build_document(cleaned_text):
+    """Construye el Document de LangChain a partir de un trámite ya limpio."""
+    # --- MODIFICADO: Formato de `page_content` mucho más completo y legible ---
+    # Se estructura la información con títulos claros para que el LLM pueda entender
+    # el contexto de cada pieza de información.
+    page_content = f"""
 **Trámite:** {cleaned_text['Nombre_Tramite']}
 **Institución Responsable:** {cleaned_text['Institucion_Responsable']}
 
@@ -105,47 +111,120 @@ def load_and_prepare_documents():
 
 **Fecha de Última Actualización de la Información:**
 {cleaned_text['Fecha_Actualizacion']}
-        """.strip()
-
-        # Creamos el objeto Document de LangChain
-        doc = Document(
-            page_content=page_content,
-            metadata={
-                "source": cleaned_text['URL_Fuente'],
-                "nombre_tramite": cleaned_text['Nombre_Tramite']
-            }
-        )
-        documents.append(doc)
+    """.strip()
+
+    # Creamos el objeto Document de LangChain
+    doc = Document(
+        page_content=page_content,
+        metadata={
+            "source": cleaned_text['URL_Fuente'],
+            "nombre_tramite": cleaned_text['Nombre_Tramite']
+        }
+    )
+    return doc
+
+def load_and_prepare_documents(profiler=None, corpus_path=None):
+    """
+    Carga los trámites de JSON_FILE_PATH (o, si se indica `corpus_path`, del corpus compacto)
+    y los prepara como documentos de LangChain.
+    """
+    profiler = profiler or IngestionProfiler()
+
+    if corpus_path:
+        if not os.path.exists(corpus_path):
+            print(f"Error: No se encontró el corpus '{corpus_path}'. Créalo con corpus_tramites.py importar.")
+            return []
+        # El corpus se recorre en streaming en una sola pasada: cada trámite se limpia y se convierte
+        # en Document al leerlo, sin tener todos los registros en memoria. La memoria se mide sobre
+        # todo el bucle; el tiempo de cada paso se acumula por registro para informarlo por separado.
+        print(f"Leyendo trámites del corpus compacto '{corpus_path}'...")
+        documents = []
+        load_seconds = clean_seconds = build_seconds = 0.0
+        with profiler.stage("lectura_corpus") as info:
+            with CorpusTramites(corpus_path, readonly=True) as corpus:
+                records = iter(corpus)
+                while True:
+                    t0 = time.perf_counter()
+                    tramite = next(records, None)
+                    t1 = time.perf_counter()
+                    load_seconds += t1 - t0
+                    if tramite is None:
+                        break
+                    cleaned_text = clean_tramite(tramite)
+                    t2 = time.perf_counter()
+                    documents.append(build_document(cleaned_text))
+                    clean_seconds += t2 - t1
+                    build_seconds += time.perf_counter() - t2
+            info["items"] = len(documents)
+        profiler.record("carga", load_seconds, len(documents), parent="lectura_corpus")
+        profiler.record("clean_html", clean_seconds, len(documents), parent="lectura_corpus")
+        profiler.record("documentos", build_seconds, len(documents), parent="lectura_corpus")
+        if not documents:
+            print(f"Advertencia: El corpus '{corpus_path}' está vacío.")
+        print(f"Se han preparado {len(documents)} documentos para ser ingresados a la base de datos.")
+        return documents
+
+    with profiler.stage("carga") as info:
+        data = load_json_tramites()
+        info["items"] = len(data)
+    if not data:
+        return []
+
+    print(f"Procesando {len(data)} trámites...")
+    with profiler.stage("clean_html", items=len(data)):
+        cleaned_tramites = [clean_tramite(tramite) for tramite in data]
+
+    with profiler.stage("documentos", items=len(cleaned_tramites)):
+        documents = [build_document(cleaned_text) for cleaned_text in cleaned_tramites]
     
     print(f"Se han preparado {len(documents)} documentos para ser ingresados a la base de datos.")
     return documents
 
 def main():
     """Función principal que orquesta la creación de la base de datos vectorial."""
-    print("Iniciando la ingesta de datos en ChromaDB...")
+    parser = argparse.ArgumentParser(description="Ingesta los trámites en una nueva versión del índice ChromaDB.")
+    parser.add_argument(
+        "--corpus", nargs='?', const=CORPUS_DB_PATH, metavar="RUTA",
+        help=f"Lee los trámites del corpus compacto SQLite (por defecto {CORPUS_DB_PATH}) en lugar de {JSON_FILE_PATH}."
+    )
+    parser.add_argument("--profile", action="store_true", help="Mide cada etapa de la ingesta y guarda un informe JSON.")
+    parser.add_argument("--profile-salida", help="Ruta del informe de perfil (por defecto perfil_ingesta_<fecha>.json).")
+    parser.add_argument("--backend", choices=BACKENDS, default=EMBEDDING_BACKEND, help=f"Backend de embeddings (por defecto {EMBEDDING_BACKEND}).")
+    parser.add_argument("--precision", choices=PRECISIONS, default=EMBEDDING_PRECISION, help=f"Precisión de la copia compacta de los vectores; float32 no la crea (por defecto {EMBEDDING_PRECISION}).")
+    args = parser.parse_args()
+    profiler = IngestionProfiler(enabled=args.profile, script="ingest_chroma.py")
 
-    if os.path.exists(CHROMA_DB_PATH):
-        print(f"Eliminando la base de datos antigua en '{CHROMA_DB_PATH}' para asegurar una carga limpia.")
-        shutil.rmtree(CHROMA_DB_PATH)
+    print("Iniciando la ingesta de datos en ChromaDB...")
     
     # 1. Cargar y preparar los documentos
-    documents = load_and_prepare_documents()
+    documents = load_and_prepare_documents(profiler, corpus_path=args.corpus)
     if not documents:
         print("No hay documentos para procesar. Finalizando.")
         return
 
-    # 2. Crear los embeddings y almacenar en ChromaDB
-    print(f"Creando embeddings con el modelo '{EMBEDDING_MODEL}'...")
+    # 2. Crear los embeddings y almacenar en ChromaDB.
+    # Se construye en un directorio versionado nuevo: el índice que se está sirviendo no se toca.
+    version_path = new_version_path()
+    print(f"Creando embeddings con el modelo '{EMBEDDING_MODEL}' (backend '{args.backend}', vectores compactos en {args.precision})...")
     print("Este proceso puede tardar varios minutos, por favor espera...")
-    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    with profiler.stage("carga_modelo"):
+        embeddings = create_embeddings(args.backend)
     
-    vector_store = Chroma.from_documents(
-        documents=documents, 
-        embedding=embeddings,
-        persist_directory=CHROMA_DB_PATH
-    )
+    try:
+        vector_store = build_vector_store(documents, embeddings, version_path, profiler)
+        if args.precision != "float32":
+            # Los vectores ya calculados se leen de Chroma: no se vuelve a embeber nada
+            with profiler.stage("vectores_compactos", items=len(documents)):
+                save_compact_vectors(vector_store, version_path, args.precision)
+        save_index_config(version_path, args.backend, args.precision)
+    except Exception:
+        discard(version_path)
+        raise
     
-    print(f"¡Proceso completado! Se ha guardado la base de datos vectorial en '{CHROMA_DB_PATH}'.")
+    # 3. Publicar la nueva versión (cambio atómico del puntero "CURRENT")
+    publish(version_path)
+    print(f"¡Proceso completado! Se ha guardado la base de datos vectorial en '{version_path}'.")
+    profiler.save(args.profile_salida)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
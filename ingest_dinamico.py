@@ -5,16 +5,23 @@
 import json
 from bs4 import BeautifulSoup
 from langchain.docstore.document import Document
-from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
 import os
 import shutil
 import argparse
 import sys
+from deduplicacion import DEFAULT_THRESHOLD, find_duplicate_clusters
+from versiones_indice import COMPLETE_MARKER, current_index_path, new_version_path, publish, discard
+from corpus_tramites import CorpusTramites
+from perfilador import IngestionProfiler, build_vector_store
+from backend_embeddings import (
+    BACKENDS, EMBEDDING_BACKEND, EMBEDDING_PRECISION, PRECISIONS,
+    create_embeddings, load_index_config, save_compact_vectors, save_index_config
+)
 
 # --- 1. Configuración ---
-CHROMA_DB_PATH = "tramites_chroma_db"
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Extensiones que se leen como corpus compacto (SQLite) en lugar de JSON
+CORPUS_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
 
 def clean_html(html_content):
     if html_content and isinstance(html_content, str) and '<' in html_content:
@@ -22,28 +29,83 @@ def clean_html(html_content):
         return soup.get_text(separator="\n", strip=True)
     return str(html_content).strip() if html_content else "No disponible"
 
-def load_and_prepare_documents(json_files):
-    """Carga trámites desde una lista de archivos JSON, los une, y los prepara."""
+# Campos que no cuentan para la similitud: identifican la página, no el procedimiento
+DEDUP_IGNORED_FIELDS = {"URL_Fuente", "Nombre_Tramite", "Institucion_Responsable", "Fecha_Actualizacion"}
+ALIAS_SEPARATOR = ", "
+
+def completeness(cleaned_text):
+    """Número de campos con información real; se usa para elegir el registro canónico."""
+    return sum(1 for v in cleaned_text.values() if v not in ("No disponible", "N/A", ""))
+
+def collapse_near_duplicates(cleaned_tramites, threshold=DEFAULT_THRESHOLD):
+    """
+    Agrupa los trámites casi duplicados (MinHash/LSH) y devuelve una lista de
+    (registro canónico, [URLs alias]) con un elemento por cluster.
+    """
+    texts = [
+        "\n".join(v for k, v in t.items() if k not in DEDUP_IGNORED_FIELDS)
+        for t in cleaned_tramites
+    ]
+    titles = [t.get("Nombre_Tramite", "") for t in cleaned_tramites]
+    clusters = find_duplicate_clusters(texts, titles=titles, threshold=threshold)
+
+    collapsed = []
+    for cluster in clusters:
+        # Canónico: el más completo, luego el más largo y, a igualdad, la URL más corta
+        canonical_idx = max(
+            cluster,
+            key=lambda i: (completeness(cleaned_tramites[i]), len(texts[i]), -len(cleaned_tramites[i].get("URL_Fuente", "")))
+        )
+        aliases = [cleaned_tramites[i].get("URL_Fuente", "N/A") for i in cluster if i != canonical_idx]
+        collapsed.append((cleaned_tramites[canonical_idx], aliases))
+
+    removed = len(cleaned_tramites) - len(collapsed)
+    duplicated_clusters = sum(1 for _, aliases in collapsed if aliases)
+    reduction = 100 * removed / len(cleaned_tramites) if cleaned_tramites else 0.0
+    print(f"Deduplicación MinHash/LSH (umbral {threshold}): {len(cleaned_tramites)} -> {len(collapsed)} documentos. "
+          f"{duplicated_clusters} grupos de casi-duplicados, {removed} copias eliminadas "
+          f"(índice {reduction:.1f}% más pequeño).")
+    return collapsed
+
+def iter_tramites(file_path):
+    """Recorre los trámites de un archivo JSON o, en streaming, de un corpus compacto."""
+    if file_path.endswith(CORPUS_EXTENSIONS):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        with CorpusTramites(file_path, readonly=True) as corpus:
+            yield from corpus
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+def load_and_prepare_documents(json_files, only_urls=None, dedup_threshold=DEFAULT_THRESHOLD, profiler=None):
+    """
+    Carga trámites desde una lista de archivos JSON, los une, y los prepara.
+    Con `dedup_threshold` (None para desactivarlo) se colapsan los casi-duplicados.
+    Si se indica `only_urls` (modo incremental), la deduplicación se hace igualmente sobre
+    el corpus completo y sólo se devuelven los clusters que contienen alguna de esas URLs.
+    """
+    profiler = profiler or IngestionProfiler()
     
     tramites_unicos = {} # Usamos un diccionario para la deduplicación
     print("Iniciando carga y unificación de archivos JSON...")
 
-    for file_path in json_files:
-        try:
-            print(f"-> Leyendo archivo: {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                tramites = json.load(f)
-                for tramite in tramites:
+    with profiler.stage("carga") as info:
+        for file_path in json_files:
+            try:
+                print(f"-> Leyendo archivo: {file_path}")
+                for tramite in iter_tramites(file_path):
                     if isinstance(tramite, dict):
                         url = tramite.get("URL_Fuente")
                         if url and url not in tramites_unicos:
                             tramites_unicos[url] = tramite
                     else:
                         print(f"  -> Advertencia: Elemento no válido (no es un diccionario) en {file_path}. Saltando.")
-        except FileNotFoundError:
-            print(f"  -> Error: No se encontró el archivo '{file_path}'. Saltando.")
-        except json.JSONDecodeError:
-            print(f"  -> Error: El archivo '{file_path}' no es un JSON válido. Saltando.")
+            except FileNotFoundError:
+                print(f"  -> Error: No se encontró el archivo '{file_path}'. Saltando.")
+            except json.JSONDecodeError:
+                print(f"  -> Error: El archivo '{file_path}' no es un JSON válido. Saltando.")
+        info["items"] = len(tramites_unicos)
     
     lista_unificada = list(tramites_unicos.values())
     if not lista_unificada:
@@ -52,10 +114,28 @@ def load_and_prepare_documents(json_files):
 
     print(f"\nSe cargaron un total de {len(lista_unificada)} trámites únicos.")
     
-    documents = []
-    for tramite in lista_unificada:
-        cleaned_text = {k: clean_html(v) for k, v in tramite.items()}
-        page_content = f"""
+    with profiler.stage("clean_html", items=len(lista_unificada)):
+        cleaned_tramites = [{k: clean_html(v) for k, v in tramite.items()} for tramite in lista_unificada]
+    if dedup_threshold is not None:
+        with profiler.stage("deduplicacion", items=len(cleaned_tramites)):
+            collapsed = collapse_near_duplicates(cleaned_tramites, threshold=dedup_threshold)
+    else:
+        collapsed = [(cleaned_text, []) for cleaned_text in cleaned_tramites]
+    if only_urls is not None:
+        collapsed = [
+            (cleaned_text, aliases) for cleaned_text, aliases in collapsed
+            if only_urls & ({cleaned_text.get("URL_Fuente")} | set(aliases))
+        ]
+
+    with profiler.stage("documentos", items=len(collapsed)):
+        documents = [build_document(cleaned_text, aliases) for cleaned_text, aliases in collapsed]
+    
+    print(f"Se han preparado {len(documents)} documentos para ser ingresados a la base de datos.")
+    return documents
+
+def build_document(cleaned_text, aliases=()):
+    """Construye el Document de LangChain de un trámite ya limpio (con sus URLs alias, si las hay)."""
+    page_content = f"""
 **Trámite:** {cleaned_text.get('Nombre_Tramite', 'N/A')}
 **Institución Responsable:** {cleaned_text.get('Institucion_Responsable', 'N/A')}
 **Descripción General:** {cleaned_text.get('Descripcion', 'N/A')}
@@ -64,16 +144,104 @@ def load_and_prepare_documents(json_files):
 **¿Cómo hago el trámite? (Procedimiento):** {cleaned_text.get('Como_Hacer_Tramite', 'N/A')}
 **Costo:** {cleaned_text.get('Costo', 'N/A')}
 **URL de la Fuente Oficial:** {cleaned_text.get('URL_Fuente', 'N/A')}
-        """.strip()
+    """.strip()
+
+    metadata = {"source": cleaned_text.get('URL_Fuente', 'N/A')}
+    if aliases:
+        # Chroma sólo admite metadatos escalares, así que las URLs alias van unidas en un texto
+        metadata["alias_urls"] = ALIAS_SEPARATOR.join(aliases)
+    return Document(page_content=page_content, metadata=metadata)
 
-        doc = Document(
-            page_content=page_content,
-            metadata={"source": cleaned_text.get('URL_Fuente', 'N/A')}
+def document_urls(metadata):
+    """Todas las URLs que representa un documento del índice: la canónica y sus alias."""
+    urls = {metadata.get("source")}
+    if metadata.get("alias_urls"):
+        urls.update(metadata["alias_urls"].split(ALIAS_SEPARATOR))
+    return urls
+
+def apply_change_feed(json_files, feed_path, dedup_threshold=DEFAULT_THRESHOLD, profiler=None):
+    """
+    Aplica un feed de cambios de recrawl_incremental.py sobre la base existente.
+    Los cambios se resuelven por cluster de casi-duplicados: si una URL del feed es la
+    canónica o un alias de un documento del índice, ese cluster se vuelve a deduplicar
+    y a indexar completo, igual que en una ingesta completa.
+    """
+    profiler = profiler or IngestionProfiler()
+    try:
+        with open(feed_path, 'r', encoding='utf-8') as f:
+            feed = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Error Crítico: No se pudo leer el feed de cambios '{feed_path}': {e}")
+        sys.exit(1)
+
+    base_path = current_index_path()
+    if not base_path:
+        print("Error Crítico: No hay ningún índice publicado. Ejecuta primero una ingesta completa (sin --cambios).")
+        sys.exit(1)
+
+    touched = set(feed.get("added", [])) | set(feed.get("modified", [])) | set(feed.get("removed", []))
+    print(f"Feed de cambios ({feed.get('generado', 'sin fecha')}): {len(feed.get('added', []))} nuevos, "
+          f"{len(feed.get('modified', []))} modificados, {len(feed.get('removed', []))} eliminados.")
+    if not touched:
+        print("El feed no contiene cambios. Finalizando.")
+        os.remove(feed_path)
+        return
+
+    # Los cambios se aplican sobre una copia del índice actual, que se publica al terminar
+    version_path = new_version_path()
+    print(f"Copiando el índice actual '{base_path}' a '{version_path}'...")
+    # Sin la marca de completado: la copia no es publicable hasta que termine
+    with profiler.stage("copia_indice"):
+        shutil.copytree(base_path, version_path, ignore=shutil.ignore_patterns(COMPLETE_MARKER))
+
+    try:
+        # Los documentos nuevos se embeben igual que los que ya están en el índice
+        config = load_index_config(base_path)
+        with profiler.stage("carga_modelo"):
+            embeddings = create_embeddings(config["backend"])
+        db = Chroma(persist_directory=version_path, embedding_function=embeddings)
+
+        existing = db.get(include=["metadatas"])
+        indexed = [(doc_id, document_urls(metadata)) for doc_id, metadata in zip(existing["ids"], existing["metadatas"])]
+
+        # Clusters del índice que contienen alguna URL del feed: se rehacen enteros
+        affected = set(touched)
+        for _, urls in indexed:
+            if urls & touched:
+                affected |= urls
+
+        documents = load_and_prepare_documents(
+            json_files, only_urls=affected, dedup_threshold=dedup_threshold, profiler=profiler
         )
-        documents.append(doc)
-    
-    print(f"Se han preparado {len(documents)} documentos para ser ingresados a la base de datos.")
-    return documents
+        # Un trámite nuevo puede unirse a un cluster que no estaba afectado; ese documento también se reemplaza
+        for doc in documents:
+            affected |= document_urls(doc.metadata)
+
+        stale_ids = [doc_id for doc_id, urls in indexed if urls & affected]
+        if stale_ids:
+            with profiler.stage("eliminacion", items=len(stale_ids)):
+                db.delete(ids=stale_ids)
+        print(f"Se eliminaron {len(stale_ids)} documentos desactualizados.")
+        added_ids = []
+        if documents:
+            # add_documents embebe y persiste a la vez, así que se miden juntos
+            with profiler.stage("embeddings_y_persistencia", items=len(documents)):
+                added_ids = db.add_documents(documents)
+            print(f"Se añadieron {len(documents)} documentos nuevos o actualizados.")
+        if config["precision"] != "float32":
+            # La copia compacta del índice se actualiza con los mismos cambios
+            with profiler.stage("vectores_compactos", items=len(added_ids)):
+                save_compact_vectors(db, version_path, config["precision"], removed_ids=stale_ids, added_ids=added_ids)
+        save_index_config(version_path, config["backend"], config["precision"])
+    except BaseException:
+        # También ante sys.exit o Ctrl+C: la copia a medias no debe quedar como versión
+        discard(version_path)
+        raise
+
+    publish(version_path)
+    # El feed queda consumido: el recrawl siguiente empieza uno nuevo en lugar de acumular sobre éste
+    os.remove(feed_path)
+    print(f"¡Actualización incremental completada en '{version_path}'! Feed '{feed_path}' aplicado y eliminado.")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -84,32 +252,89 @@ def main():
     parser.add_argument(
         "json_files", 
         nargs='+',
-        help="Ruta a uno o más archivos JSON de trámites para ingestar."
+        help="Ruta a uno o más archivos JSON de trámites (o corpus compactos .db) para ingestar."
+    )
+    parser.add_argument(
+        "--cambios",
+        metavar="FEED",
+        help="Feed de cambios de recrawl_incremental.py: actualiza sólo esos trámites en la base existente."
+    )
+    parser.add_argument(
+        "--umbral-duplicados",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Similitud (0-1) a partir de la cual dos trámites se consideran casi duplicados (por defecto {DEFAULT_THRESHOLD})."
+    )
+    parser.add_argument(
+        "--sin-dedup",
+        action="store_true",
+        help="Desactiva la detección de casi-duplicados con MinHash."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=EMBEDDING_BACKEND,
+        help=f"Backend de embeddings: torch (sentence-transformers) u onnx (ONNX Runtime cuantizado). Por defecto {EMBEDDING_BACKEND}."
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=EMBEDDING_PRECISION,
+        help=f"Precisión de la copia compacta de los vectores (float16/int8); float32 no la crea. Por defecto {EMBEDDING_PRECISION}."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Mide cada etapa de la ingesta (tiempo, docs/s, memoria) y guarda un informe JSON."
+    )
+    parser.add_argument(
+        "--profile-salida",
+        help="Ruta del informe de perfil (por defecto perfil_ingesta_<fecha>.json)."
     )
     args = parser.parse_args()
+    profiler = IngestionProfiler(enabled=args.profile, script="ingest_dinamico.py")
+
+    if args.cambios:
+        apply_change_feed(
+            args.json_files, args.cambios,
+            dedup_threshold=None if args.sin_dedup else args.umbral_duplicados,
+            profiler=profiler
+        )
+        profiler.save(args.profile_salida)
+        return
     
     print(f"Iniciando la ingesta de datos en ChromaDB...")
     print(f"Archivos a procesar: {', '.join(args.json_files)}")
-
-    if os.path.exists(CHROMA_DB_PATH):
-        print(f"Eliminando la base de datos antigua en '{CHROMA_DB_PATH}'.")
-        shutil.rmtree(CHROMA_DB_PATH)
     
-    documents = load_and_prepare_documents(args.json_files)
+    documents = load_and_prepare_documents(
+        args.json_files,
+        dedup_threshold=None if args.sin_dedup else args.umbral_duplicados,
+        profiler=profiler
+    )
     if not documents:
         print("No hay documentos para procesar. Finalizando.")
         return
 
-    print(f"Creando embeddings... (puede tardar varios minutos)")
-    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    # Se construye en un directorio versionado nuevo; el índice servido no se toca hasta publicar
+    version_path = new_version_path()
+    print(f"Creando embeddings con el backend '{args.backend}' (vectores compactos en {args.precision})... (puede tardar varios minutos)")
+    with profiler.stage("carga_modelo"):
+        embeddings = create_embeddings(args.backend)
     
-    Chroma.from_documents(
-        documents=documents, 
-        embedding=embeddings,
-        persist_directory=CHROMA_DB_PATH
-    )
+    try:
+        vector_store = build_vector_store(documents, embeddings, version_path, profiler)
+        if args.precision != "float32":
+            # Los vectores ya calculados se leen de Chroma: no se vuelve a embeber nada
+            with profiler.stage("vectores_compactos", items=len(documents)):
+                save_compact_vectors(vector_store, version_path, args.precision)
+        save_index_config(version_path, args.backend, args.precision)
+    except Exception:
+        discard(version_path)
+        raise
     
-    print(f"¡Proceso completado! Se ha guardado la base de datos vectorial en '{CHROMA_DB_PATH}'.")
+    publish(version_path)
+    print(f"¡Proceso completado! Se ha guardado la base de datos vectorial en '{version_path}'.")
+    profiler.save(args.profile_salida)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
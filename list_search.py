@@ -10,12 +10,13 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-from urllib.parse import quote
+from scraper_paralelo import get_tramite_urls_parallel
+from render_ligero import LEAN_RENDER, apply_lean_options, block_heavy_resources
+from corpus_tramites import CorpusTramites
 
 # --- 1. Configuración Global ---
 BASE_URL = "https://www.gob.ec"
 LIST_URL_TEMPLATE = f"{BASE_URL}/tramites/lista?page={{page}}"
-SEARCH_URL_TEMPLATE = f"{BASE_URL}/tramites/buscar?search_api_fulltext={{keyword}}&page={{page}}"
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -31,6 +32,19 @@ SEARCH_KEYWORDS = [
 
 # --- 2. Funciones de Extracción de URLs ---
 
+def setup_driver(lean_render=LEAN_RENDER):
+    """Configura e inicializa un navegador Selenium headless (opcionalmente en render ligero)."""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if lean_render:
+        apply_lean_options(chrome_options)
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    if lean_render:
+        block_heavy_resources(driver)
+    return driver
+
 def get_urls_from_page(driver, url, url_set):
     """Obtiene todas las URLs de trámites de una única página y las añade a un set."""
     try:
@@ -108,11 +122,7 @@ def scrape_tramite_details(tramite_url):
 
 if __name__ == "__main__":
     print("Configurando el navegador Selenium para la recolección exhaustiva...")
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    driver = setup_driver()
 
     all_urls = set()
 
@@ -122,16 +132,17 @@ if __name__ == "__main__":
         if not get_urls_from_page(driver, LIST_URL_TEMPLATE.format(page=i), all_urls):
             break
 
+    driver.quit()
+
     # FASE 2: BÚSQUEDA DIRIGIDA POR PALABRAS CLAVE
+    # Se reparte entre un pool de navegadores y se fusiona en el mismo set `all_urls`.
     print("\n=== INICIANDO FASE 2: BÚSQUEDA POR PALABRAS CLAVE ===")
-    for keyword in SEARCH_KEYWORDS:
-        print(f"\n--- Buscando trámites para la palabra clave: '{keyword}' ---")
-        for i in range(20): # Límite de páginas por búsqueda
-            url = SEARCH_URL_TEMPLATE.format(keyword=quote(keyword), page=i)
-            if not get_urls_from_page(driver, url, all_urls):
-                break
-    
-    driver.quit()
+    get_tramite_urls_parallel(
+        SEARCH_KEYWORDS,
+        driver_factory=setup_driver,
+        max_pages_per_keyword=20, # Límite de páginas por búsqueda
+        url_set=all_urls
+    )
     final_urls = list(all_urls)
     print(f"\nRecolección HÍBRIDA finalizada. Total de URLs únicas encontradas: {len(final_urls)}")
 
@@ -148,5 +159,8 @@ if __name__ == "__main__":
         output_filename = "tramites_extraidos_COMPLETO.json"
         with open(output_filename, 'w', encoding='utf-8') as f:
             json.dump(all_tramites, f, ensure_ascii=False, indent=4)
+
+        with CorpusTramites() as corpus:
+            corpus.put_many(all_tramites)
         
-        print(f"\n¡PROCESO COMPLETADO! Se han guardado {len(all_tramites)} trámites en '{output_filename}'.")
+        print(f"\n¡PROCESO COMPLETADO! Se han guardado {len(all_tramites)} trámites en '{output_filename}' y en el corpus compacto.")
@@ -2,7 +2,7 @@
 # Versión 4.0: Implementa Reescritura de Consultas (Query Rewriting) para una búsqueda
 # semántica de alta precisión y actualiza las librerías a la versión moderna.
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from langchain_groq import ChatGroq
@@ -11,18 +11,36 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 # --- CAMBIO: Importaciones modernas para Chroma y Embeddings ---
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 # --- Fin del Cambio ---
+import asyncio
+import hashlib
 import os
 from dotenv import load_dotenv
+from versiones_indice import current_index_path, current_version
+from corpus_tramites import CORPUS_DB_PATH, CorpusTramites
+from admision import AdmissionController, AdmissionRejected
+from backend_embeddings import EMBEDDING_BACKEND, CompactVectors, create_embeddings, load_index_config
 
 # Cargar las variables de entorno
 load_dotenv()
 
 # --- 1. Configuración ---
-CHROMA_DB_PATH = "tramites_chroma_db"
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 GROQ_MODEL = "llama3-8b-8192"
+RETRIEVER_K = 4
+# Si el índice tiene vectores compactos (float16/int8), se piden a Chroma tantos candidatos
+# y se reordenan con ellos para quedarse con los RETRIEVER_K mejores
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "20"))
+# Cada cuántos segundos se comprueba si la ingesta publicó una nueva versión del índice
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "30"))
+# Control de admisión de /chat (ver admision.py)
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "8"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_MAX_PER_CLIENT = int(os.getenv("CHAT_MAX_PER_CLIENT", "4"))
+# API keys reconocidas (separadas por comas); una clave que no esté aquí no identifica al cliente
+CHAT_API_KEYS = {k.strip() for k in os.getenv("CHAT_API_KEYS", "").split(",") if k.strip()}
+# IPs de los proxies inversos de confianza; sólo a ellos se les acepta la cabecera X-Forwarded-For
+TRUSTED_PROXIES = {p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()}
 
 # --- 2. Modelo de Datos ---
 class ChatQuery(BaseModel):
@@ -74,54 +92,204 @@ Eres un asistente virtual experto en trámites del gobierno de Ecuador. Tu misi
 **Tu Respuesta Detallada:**
 """
 
-rag_chain = None
+active_index = None
+active_index_version = None
+# Índices cargados que aún no se han liberado: el activo y los retirados con peticiones en curso
+open_indexes = []
+# Un modelo de embeddings por backend ("torch"/"onnx"), cargado una sola vez y reutilizado en cada recarga
+embeddings_by_backend = {}
+index_watcher_task = None
+corpus = None
+admission = AdmissionController(
+    max_in_flight=CHAT_MAX_IN_FLIGHT,
+    max_queue=CHAT_MAX_QUEUE,
+    queue_timeout=CHAT_QUEUE_TIMEOUT,
+    max_per_client=CHAT_MAX_PER_CLIENT,
+)
+
+def client_ip(request: Request):
+    """
+    IP del cliente. Detrás de un proxy de confianza se toma de X-Forwarded-For la última
+    dirección que no sea otro proxy de confianza (las anteriores las puede falsear el cliente).
+    """
+    ip = request.client.host if request.client else "desconocido"
+    if ip not in TRUSTED_PROXIES:
+        return ip
+    forwarded = [a.strip() for a in request.headers.get("X-Forwarded-For", "").split(",") if a.strip()]
+    for address in reversed(forwarded):
+        if address not in TRUSTED_PROXIES:
+            return address
+    return ip
+
+def client_identifier(request: Request):
+    """Identifica al cliente por su API key (sólo si está en CHAT_API_KEYS) o por su IP."""
+    api_key = request.headers.get("X-API-Key")
+    if api_key in CHAT_API_KEYS:
+        # No exponemos la clave en las métricas, sólo un resumen
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    # Una clave desconocida no cuenta: si no, bastaría una clave nueva por petición para saltarse el límite
+    return "ip:" + client_ip(request)
+
+def embeddings_for_backend(backend):
+    """Devuelve el modelo de embeddings de `backend`, cargándolo la primera vez."""
+    if backend not in embeddings_by_backend:
+        embeddings_by_backend[backend] = create_embeddings(backend)
+    return embeddings_by_backend[backend]
+
+class ServedIndex:
+    """Una versión del índice cargada en memoria y cuántas peticiones de /chat la están usando."""
+
+    def __init__(self, version, db_path, db, chain):
+        self.version = version
+        self.db_path = db_path
+        self.db = db
+        self.chain = chain
+        self.in_flight = 0
+        self.retired = False
+
+    def acquire(self):
+        self.in_flight += 1
+        return self.chain
+
+    def release(self):
+        self.in_flight -= 1
+        if self.retired and self.in_flight == 0:
+            close_index(self)
+
+    def retire(self):
+        """Deja de servirse; se libera en cuanto terminan las peticiones que aún lo usan."""
+        self.retired = True
+        if self.in_flight == 0:
+            close_index(self)
+
+def close_index(index):
+    """Libera el cliente Chroma de un índice retirado (datos HNSW y conexiones SQLite)."""
+    open_indexes.remove(index)
+    if any(other.db_path == index.db_path for other in open_indexes):
+        # chromadb comparte un cliente por ruta: otro índice cargado (p. ej. tras un rollback) lo sigue usando
+        return
+    try:
+        # chromadb guarda un sistema por ruta durante toda la vida del proceso: hay que pararlo y sacarlo de su caché
+        client = index.db._client
+        client._system.stop()
+        type(client)._identifier_to_system.pop(client._identifier, None)
+        print(f"Índice retirado '{index.db_path}' liberado.")
+    except Exception as e:
+        print(f"Advertencia: No se pudo liberar el índice '{index.db_path}': {e}")
+
+def build_rag_chain(db_path):
+    """Abre el índice ChromaDB de `db_path` y construye sobre él la cadena RAG completa. Devuelve (db, cadena)."""
+    # Las consultas se embeben con el mismo backend con el que se construyó el índice
+    config = load_index_config(db_path)
+    embeddings = embeddings_for_backend(config["backend"])
+    print(f"Embeddings del índice: backend '{config['backend']}', precisión '{config['precision']}'.")
+    # --- CAMBIO: Usamos las clases modernas ---
+    db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+    # --- Fin del Cambio ---
+    
+    retriever = db.as_retriever(search_kwargs={'k': RETRIEVER_K}) # Aumentamos a 4 para más contexto
+    compact = CompactVectors.load(db_path) if config["precision"] != "float32" else None
+    if compact is not None:
+        print(f"Vectores compactos ({compact.precision}): {len(compact.ids)} documentos; se reordenan {RERANK_FETCH_K} candidatos.")
+
+    def rerank_search(query):
+        """Pide RERANK_FETCH_K candidatos a Chroma y los ordena con los vectores compactos."""
+        query_vector = embeddings.embed_query(query)
+        candidates = db.similarity_search_by_vector(query_vector, k=RERANK_FETCH_K)
+        scores = compact.scores([doc.id for doc in candidates], query_vector)
+        # Un candidato sin vector compacto conserva su puesto detrás de los que sí lo tienen
+        ranked = sorted(
+            range(len(candidates)),
+            key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i)
+        )
+        return [candidates[i] for i in ranked[:RETRIEVER_K]]
+    
+    llm = ChatGroq(model=GROQ_MODEL)
+    
+    # --- NUEVO: Cadena de Reescritura ---
+    rewrite_prompt = ChatPromptTemplate.from_template(REWRITE_PROMPT_TEMPLATE)
+    query_rewriter = rewrite_prompt | llm | StrOutputParser()
+    
+    # --- CADENA RAG COMPLETA Y MEJORADA ---
+    def retrieve_docs(query):
+        """Función que reescribe la pregunta y luego busca en la DB."""
+        print(f"Pregunta original: '{query}'")
+        rewritten_query = query_rewriter.invoke({"question": query})
+        print(f"Pregunta reescrita: '{rewritten_query}'")
+        if compact is not None:
+            return rerank_search(rewritten_query)
+        return retriever.invoke(rewritten_query)
+
+    response_prompt = ChatPromptTemplate.from_template(RESPONSE_PROMPT_TEMPLATE)
+
+    return db, (
+        {
+            "context": RunnablePassthrough() | retrieve_docs,
+            "question": RunnablePassthrough()
+        }
+        | response_prompt
+        | llm
+        | StrOutputParser()
+    )
+
+async def load_current_index():
+    """Carga (o recarga) la cadena RAG con la versión publicada del índice y la activa."""
+    global active_index, active_index_version
+
+    version = current_version()
+    db_path = current_index_path()
+    if not db_path:
+        print("Error Crítico: No hay ningún índice ChromaDB publicado. Ejecuta el script de ingesta primero.")
+        return False
+
+    try:
+        # Se construye fuera del event loop para no bloquear las peticiones en curso
+        db, new_chain = await asyncio.to_thread(build_rag_chain, db_path)
+    except Exception as e:
+        print(f"Error al cargar el índice '{db_path}': {e}")
+        return False
+
+    # Intercambio atómico: las peticiones en curso terminan con la cadena que ya tenían
+    previous_index = active_index
+    active_index = ServedIndex(version, db_path, db, new_chain)
+    open_indexes.append(active_index)
+    active_index_version = version
+    if previous_index is not None:
+        previous_index.retire()
+    print(f"Índice activo: '{db_path}'.")
+    return True
+
+async def watch_index_versions():
+    """Comprueba periódicamente el puntero CURRENT y recarga el índice si cambió (o hubo rollback)."""
+    while True:
+        await asyncio.sleep(INDEX_POLL_SECONDS)
+        version = current_version()
+        if version and version != active_index_version:
+            print(f"Nueva versión del índice detectada: '{version}'. Recargando en segundo plano...")
+            await load_current_index()
 
 @app.on_event("startup")
 async def startup_event():
-    global rag_chain
+    global index_watcher_task, corpus
     
-    print("Cargando la base de datos ChromaDB...")
-    if not os.path.exists(CHROMA_DB_PATH):
-        print(f"Error Crítico: El directorio '{CHROMA_DB_PATH}' no existe. Ejecuta el script de ingesta primero.")
-        return
+    # Corpus compacto para consultar los datos estructurados de un trámite por su URL
+    if os.path.exists(CORPUS_DB_PATH):
+        corpus = CorpusTramites(CORPUS_DB_PATH, readonly=True)
+        print(f"Corpus de trámites abierto: {len(corpus)} registros en '{CORPUS_DB_PATH}'.")
+    else:
+        print(f"Advertencia: No existe '{CORPUS_DB_PATH}'; el endpoint /tramite no estará disponible.")
 
+    print("Cargando la base de datos ChromaDB...")
     try:
-        # --- CAMBIO: Usamos las clases modernas ---
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        db = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings)
-        # --- Fin del Cambio ---
-        
-        retriever = db.as_retriever(search_kwargs={'k': 4}) # Aumentamos a 4 para más contexto
-        
-        llm = ChatGroq(model=GROQ_MODEL)
-        
-        # --- NUEVO: Cadena de Reescritura ---
-        rewrite_prompt = ChatPromptTemplate.from_template(REWRITE_PROMPT_TEMPLATE)
-        query_rewriter = rewrite_prompt | llm | StrOutputParser()
-        
-        # --- CADENA RAG COMPLETA Y MEJORADA ---
-        def retrieve_docs(query):
-            """Función que reescribe la pregunta y luego busca en la DB."""
-            print(f"Pregunta original: '{query}'")
-            rewritten_query = query_rewriter.invoke({"question": query})
-            print(f"Pregunta reescrita: '{rewritten_query}'")
-            return retriever.invoke(rewritten_query)
-
-        response_prompt = ChatPromptTemplate.from_template(RESPONSE_PROMPT_TEMPLATE)
-
-        rag_chain = (
-            {
-                "context": RunnablePassthrough() | retrieve_docs,
-                "question": RunnablePassthrough()
-            }
-            | response_prompt
-            | llm
-            | StrOutputParser()
-        )
-        print("¡Servicio de Chatbot listo y optimizado con Reescritura de Consultas!")
+        # Se precarga el backend configurado (EMBEDDING_BACKEND); si el índice usa otro, se carga al activarlo
+        embeddings_for_backend(EMBEDDING_BACKEND)
     except Exception as e:
         print(f"Error fatal durante la inicialización: {e}")
-        rag_chain = None
+        return
+
+    if await load_current_index():
+        print("¡Servicio de Chatbot listo y optimizado con Reescritura de Consultas!")
+    index_watcher_task = asyncio.create_task(watch_index_versions())
 
 # --- 5. Endpoints ---
 
@@ -129,12 +297,56 @@ async def startup_event():
 def read_root():
     return {"message": "Bienvenido al Asistente Inteligente de Trámites. Usa el endpoint /chat."}
 
+@app.get("/indice")
+def read_index_version():
+    return {"version": active_index_version, "publicada": current_version()}
+
+@app.get("/tramite")
+def read_tramite(
+    url: str = Query(..., description="URL_Fuente del trámite."),
+    campos: list[str] | None = Query(None, description="Campos a devolver (por defecto, todos).")
+):
+    if corpus is None:
+        raise HTTPException(status_code=503, detail="El corpus de trámites no está disponible.")
+    record = corpus.get(url)
+    if record is None:
+        raise HTTPException(status_code=404, detail="No se encontró ningún trámite con esa URL.")
+    # Sólo se decodifican los campos pedidos
+    if campos:
+        return {campo: record[campo] for campo in campos if campo in record}
+    return record.to_dict()
+
+@app.get("/metrics")
+def read_metrics():
+    return {"chat": admission.metrics(), "indice": active_index_version}
+
 @app.post("/chat")
-async def handle_chat(query: ChatQuery):
-    if not rag_chain:
+async def handle_chat(query: ChatQuery, request: Request):
+    if not active_index:
         raise HTTPException(status_code=503, detail="El servicio de Chatbot no está inicializado.")
 
-    response = rag_chain.invoke(query.query_text)
+    try:
+        async with admission.slot(client_identifier(request)):
+            # Referencia local: si el índice se recarga a mitad de la petición, ésta no se ve afectada,
+            # y el índice anterior no se libera hasta que termine
+            index = active_index
+            chain = index.acquire()
+            loop = asyncio.get_running_loop()
+
+            def invoke_and_release():
+                # Se libera al terminar el hilo, no al cancelarse la petición: el hilo sigue usando el índice
+                try:
+                    return chain.invoke(query.query_text)
+                finally:
+                    loop.call_soon_threadsafe(index.release)
+
+            response = await asyncio.to_thread(invoke_and_release)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="El servicio está saturado en este momento. Inténtalo de nuevo en unos segundos.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
     return {"response": response}
 
@@ -0,0 +1,204 @@
+# perfilador.py
+# Perfilador de la ingesta (modo --profile de ingest_chroma.py e ingest_dinamico.py).
+# Mide cada etapa (carga, clean_html, Documentos, embeddings, persistencia): tiempo,
+# documentos/segundo, pico de RSS y principales asignaciones según tracemalloc,
+# y guarda un informe JSON para comparar ejecuciones a medida que crece el corpus.
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import Chroma
+
+MB = 1024 * 1024
+RSS_SAMPLE_SECONDS = 0.05
+TOP_ALLOCATIONS = 10
+
+def current_rss_bytes():
+    """RSS actual del proceso; si /proc no existe, el máximo que informa getrusage (0 si tampoco está disponible)."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        try:
+            # resource sólo existe en Unix; se importa aquí para que los scripts de ingesta funcionen en Windows
+            import resource
+        except ImportError:
+            return 0
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB; macOS, en bytes
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+class _RssSampler(threading.Thread):
+    """Hilo que muestrea el RSS durante una etapa y se queda con el pico."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = current_rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_bytes())
+        return self.peak
+
+class IngestionProfiler:
+    """
+    Uso: `with profiler.stage("clean_html", items=len(data)): ...`.
+    Desactivado (enabled=False) no mide nada, así el código de la ingesta es el mismo con y sin --profile.
+    """
+
+    def __init__(self, enabled=False, script=None):
+        self.enabled = enabled
+        self.script = script
+        self.stages = []
+        self._start = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, items=None):
+        """Mide una etapa. Si `items` no se conoce de antemano, se puede fijar con info['items']."""
+        info = {"items": items}
+        if not self.enabled:
+            yield info
+            return
+
+        print(f"[perfil] Etapa '{name}'...")
+        sampler = _RssSampler()
+        rss_start = sampler.peak
+        tracemalloc.reset_peak()
+        snapshot_start = tracemalloc.take_snapshot()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            elapsed = time.perf_counter() - start
+            rss_peak = sampler.stop()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            snapshot_end = tracemalloc.take_snapshot()
+            top = snapshot_end.compare_to(snapshot_start, "lineno")[:TOP_ALLOCATIONS]
+
+            items = info["items"]
+            self.stages.append({
+                "etapa": name,
+                "segundos": round(elapsed, 4),
+                "documentos": items,
+                "docs_por_segundo": round(items / elapsed, 2) if items and elapsed > 0 else None,
+                "rss_inicio_mb": round(rss_start / MB, 1),
+                "rss_pico_mb": round(rss_peak / MB, 1),
+                "tracemalloc_pico_mb": round(traced_peak / MB, 1),
+                "top_asignaciones": [
+                    {
+                        "ubicacion": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "kb_diferencia": round(stat.size_diff / 1024, 1),
+                        "bloques_diferencia": stat.count_diff,
+                    }
+                    for stat in top
+                ],
+            })
+
+    def record(self, name, seconds, items=None, parent=None):
+        """
+        Registra una etapa medida a mano (tiempos acumulados dentro de un bucle). Su memoria no se
+        puede separar de la del bucle, que se mide con stage() en la etapa `parent`.
+        """
+        if not self.enabled:
+            return
+        self.stages.append({
+            "etapa": name,
+            "parte_de": parent,
+            "segundos": round(seconds, 4),
+            "documentos": items,
+            "docs_por_segundo": round(items / seconds, 2) if items and seconds > 0 else None,
+            "rss_inicio_mb": None,
+            "rss_pico_mb": None,
+            "tracemalloc_pico_mb": None,
+            "top_asignaciones": [],
+        })
+
+    def report(self):
+        return {
+            "script": self.script,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "segundos_total": round(time.perf_counter() - self._start, 4),
+            "rss_pico_mb": max((s["rss_pico_mb"] for s in self.stages if s["rss_pico_mb"] is not None), default=None),
+            "etapas": self.stages,
+        }
+
+    def print_summary(self):
+        print("\n--- Perfil de la ingesta ---")
+        print(f"{'Etapa':<16}{'Segundos':>10}{'Docs':>8}{'Docs/s':>10}{'RSS pico (MB)':>15}{'Py pico (MB)':>14}")
+        for s in self.stages:
+            docs = s["documentos"] if s["documentos"] is not None else "-"
+            rate = s["docs_por_segundo"] if s["docs_por_segundo"] is not None else "-"
+            rss = s["rss_pico_mb"] if s["rss_pico_mb"] is not None else "-"
+            traced = s["tracemalloc_pico_mb"] if s["tracemalloc_pico_mb"] is not None else "-"
+            # Las subetapas de un bucle se sangran bajo la etapa que las contiene
+            name = ("  " if s.get("parte_de") else "") + s["etapa"]
+            print(f"{name:<16}{s['segundos']:>10.2f}{docs:>8}{rate:>10}{rss:>15}{traced:>14}")
+        # Una etapa que contiene subetapas no cuenta como la más lenta: se compara con las demás por separado
+        parents = {s.get("parte_de") for s in self.stages}
+        leaves = [s for s in self.stages if s["etapa"] not in parents]
+        if leaves:
+            slowest = max(leaves, key=lambda s: s["segundos"])
+            print(f"Etapa más lenta: '{slowest['etapa']}' ({slowest['segundos']:.2f}s).")
+
+    def save(self, path=None):
+        """Muestra el resumen y guarda el informe JSON. No hace nada si el perfilador está desactivado."""
+        if not self.enabled:
+            return None
+        self.print_summary()
+        path = path or datetime.now().strftime("perfil_ingesta_%Y%m%d-%H%M%S.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=4)
+        print(f"Informe de perfil guardado en '{path}'.")
+        return path
+
+class _PrecomputedEmbeddings(Embeddings):
+    """Devuelve vectores ya calculados para que Chroma sólo mida la persistencia."""
+
+    def __init__(self, base, texts, vectors):
+        self._base = base
+        self._vectors = dict(zip(texts, vectors))
+
+    def embed_documents(self, texts):
+        missing = [t for t in texts if t not in self._vectors]
+        if missing:
+            self._vectors.update(zip(missing, self._base.embed_documents(missing)))
+        return [self._vectors[t] for t in texts]
+
+    def embed_query(self, text):
+        return self._base.embed_query(text)
+
+def build_vector_store(documents, embeddings, persist_directory, profiler):
+    """
+    Equivale a Chroma.from_documents. Con el perfilador activo, separa el cálculo
+    de embeddings de la escritura en Chroma para medir cada etapa por separado.
+    """
+    if not profiler.enabled:
+        return Chroma.from_documents(documents=documents, embedding=embeddings, persist_directory=persist_directory)
+
+    texts = [doc.page_content for doc in documents]
+    with profiler.stage("embeddings", items=len(texts)):
+        vectors = embeddings.embed_documents(texts)
+    with profiler.stage("persistencia", items=len(documents)):
+        return Chroma.from_documents(
+            documents=documents,
+            embedding=_PrecomputedEmbeddings(embeddings, texts, vectors),
+            persist_directory=persist_directory
+        )
@@ -0,0 +1,304 @@
+# recrawl_incremental.py
+# Planificador de recrawl incremental: en lugar de volver a extraer todos los trámites,
+# prioriza las URLs según su antigüedad y la frecuencia de cambio observada, comprueba
+# con una petición HTTP barata si la página cambió y sólo entonces extrae los detalles.
+# Genera un "feed de cambios" (added/modified/removed) que ingest_dinamico.py puede consumir.
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from datetime import datetime
+import requests
+from bs4 import BeautifulSoup
+from scraper_lista import HEADERS, parse_tramite_details
+from corpus_tramites import CORPUS_DB_PATH, CorpusTramites
+
+# --- 1. Configuración ---
+CORPUS_FILE = "tramites_extraidos_LISTA.json"
+URLS_CHECKPOINT_FILE = "urls_encontradas.json"
+STATE_FILE = "recrawl_estado.json"
+CHANGE_FEED_FILE = "cambios_tramites.json"
+
+DAY_SECONDS = 24 * 60 * 60
+# Frecuencia de cambio supuesta (cambios/día) cuando no sabemos nada de una URL
+DEFAULT_CHANGE_RATE = 1 / 90
+# Selectores del bloque principal de la ficha, en orden de preferencia; su texto forma la huella
+# de contenido. Se prueban uno a uno: select_one con una lista devolvería el primero en el
+# documento (siempre <body>), y la huella cambiaría con cualquier retoque de menús o pie.
+CONTENT_SELECTORS = ("div.view-mode-full", "main", "body")
+
+# --- 2. Estado persistente del recrawl ---
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Advertencia: '{path}' no es un JSON válido. Se ignorará.")
+        return default
+
+def save_json(path, data):
+    # Escribimos en un archivo temporal y lo renombramos para no dejar archivos a medias
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+def parse_fecha_actualizacion(value):
+    """Convierte 'AAAA/MM/DD' (formato de gob.ec) a timestamp, o None si no se puede."""
+    try:
+        return datetime.strptime(value.strip(), "%Y/%m/%d").timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+def init_url_state(tramite=None, scraped_at=None):
+    """Estado inicial de una URL, sembrado con la Fecha_Actualizacion del corpus si existe."""
+    state = {
+        # Para los trámites ya extraídos, la última revisión es la fecha del archivo del corpus
+        "ultima_revision": scraped_at if tramite else None,
+        "revisiones": 0,
+        "cambios": 0,
+        "primera_observacion": time.time(),
+        "etag": None,
+        "last_modified": None,
+        "huella": None,
+        "fecha_actualizacion": None,
+    }
+    if tramite:
+        state["fecha_actualizacion"] = tramite.get("Fecha_Actualizacion")
+        published = parse_fecha_actualizacion(tramite.get("Fecha_Actualizacion"))
+        if published:
+            # Lo que sabemos del pasado cuenta como periodo observado sin cambios
+            state["primera_observacion"] = published
+    return state
+
+# --- 3. Priorización ---
+
+def estimate_change_rate(state, now):
+    """
+    Estima la frecuencia de cambio (cambios/día) con un modelo de Poisson:
+    cambios observados sobre el tiempo observado, suavizado con un cambio "virtual".
+    """
+    observed_days = max((now - state["primera_observacion"]) / DAY_SECONDS, 1.0)
+    prior_days = 1 / DEFAULT_CHANGE_RATE
+    return (state["cambios"] + 1) / (observed_days + prior_days)
+
+def recrawl_priority(state, now):
+    """Probabilidad estimada de que la página haya cambiado desde la última revisión."""
+    if state["ultima_revision"] is None:
+        # URL descubierta pero nunca extraída: va primero
+        return float("inf")
+    staleness_days = (now - state["ultima_revision"]) / DAY_SECONDS
+    return 1 - math.exp(-estimate_change_rate(state, now) * staleness_days)
+
+def schedule(state, now, limit=None, min_priority=0.0):
+    """Devuelve las URLs ordenadas por prioridad descendente, filtradas y limitadas."""
+    ranked = sorted(
+        ((recrawl_priority(url_state, now), url) for url, url_state in state.items()),
+        reverse=True
+    )
+    urls = [url for priority, url in ranked if priority >= min_priority]
+    return urls[:limit] if limit else urls
+
+# --- 4. Comprobación barata y extracción ---
+
+def content_fingerprint(soup):
+    """Huella del contenido visible de la ficha, ignorando scripts y estilos (los elimina del soup)."""
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    container = next((c for c in map(soup.select_one, CONTENT_SELECTORS) if c is not None), None)
+    text = container.get_text(separator="\n", strip=True) if container else ""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def check_url(session, url, url_state):
+    """
+    Hace un GET condicional (ETag / Last-Modified). Devuelve (estado, soup, validadores):
+    estado es 'unchanged', 'modified', 'removed' o 'error'; soup sólo se devuelve si hay que extraer.
+    Los validadores (ETag, Last-Modified, huella, fecha) no se guardan aquí: quien llama los
+    aplica a url_state sólo cuando el trámite quedó guardado, para no perder un cambio.
+    """
+    headers = {}
+    if url_state.get("etag"):
+        headers["If-None-Match"] = url_state["etag"]
+    if url_state.get("last_modified"):
+        headers["If-Modified-Since"] = url_state["last_modified"]
+
+    try:
+        response = session.get(url, headers=headers, timeout=20)
+    except requests.exceptions.RequestException as e:
+        print(f"  -> Error comprobando {url}: {e}")
+        return "error", None, None
+
+    if response.status_code == 304:
+        return "unchanged", None, None
+    if response.status_code in (404, 410):
+        return "removed", None, None
+    if response.status_code != 200:
+        print(f"  -> Respuesta inesperada ({response.status_code}) para {url}")
+        return "error", None, None
+
+    soup = BeautifulSoup(response.content, 'html.parser')
+    fecha_tag = soup.select_one("div.text-right > p")
+    fecha = fecha_tag.get_text(strip=True).replace("Fecha de última actualización:", "").strip() if fecha_tag else None
+    fingerprint = content_fingerprint(soup)
+
+    if url_state.get("huella") is None:
+        # Primera revisión: sin huella previa, nos basta con comparar la fecha publicada
+        changed = fecha is None or fecha != url_state.get("fecha_actualizacion")
+    else:
+        changed = fingerprint != url_state["huella"]
+
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "huella": fingerprint,
+    }
+    if fecha:
+        validators["fecha_actualizacion"] = fecha
+    return ("modified" if changed else "unchanged"), soup, validators
+
+def merge_feed(pending, feed):
+    """
+    Acumula el feed de esta pasada sobre el que aún no ha aplicado la ingesta, para que
+    varias pasadas seguidas (p. ej. con --max) no pierdan cambios. Se mantiene el efecto
+    neto sobre el índice: un "removed" posterior anula un "added" que nunca llegó a indexarse,
+    y un "added" tras un "removed" pendiente es una modificación del documento que sigue indexado.
+    """
+    added = set(pending.get("added", []))
+    modified = set(pending.get("modified", []))
+    removed = set(pending.get("removed", []))
+
+    for url in feed["added"]:
+        if url in removed:
+            removed.discard(url)
+            modified.add(url)
+        elif url not in modified:
+            added.add(url)
+    for url in feed["modified"]:
+        if url not in added:
+            modified.add(url)
+    for url in feed["removed"]:
+        modified.discard(url)
+        if url in added:
+            added.discard(url)
+        else:
+            removed.add(url)
+
+    return {
+        "generado": feed["generado"],
+        "desde": pending.get("desde") or pending.get("generado") or feed["generado"],
+        "added": sorted(added),
+        "modified": sorted(modified),
+        "removed": sorted(removed),
+    }
+
+# --- 5. Orquestador ---
+
+def run_recrawl(corpus_file=CORPUS_FILE, urls_file=URLS_CHECKPOINT_FILE, state_file=STATE_FILE,
+                feed_file=CHANGE_FEED_FILE, limit=None, min_priority=0.0, delay=0.2,
+                corpus_db=CORPUS_DB_PATH):
+    now = time.time()
+    tramites = {t["URL_Fuente"]: t for t in load_json(corpus_file, []) if isinstance(t, dict) and t.get("URL_Fuente")}
+    state = load_json(state_file, {})
+    scraped_at = os.path.getmtime(corpus_file) if os.path.exists(corpus_file) else None
+
+    # Sembramos el estado con el corpus actual y con las URLs descubiertas que aún no tenemos
+    for url, tramite in tramites.items():
+        state.setdefault(url, init_url_state(tramite, scraped_at))
+    discovered_urls = load_json(urls_file, [])
+    for url in discovered_urls:
+        state.setdefault(url, init_url_state())
+
+    to_check = schedule(state, now, limit=limit, min_priority=min_priority)
+    print(f"URLs conocidas: {len(state)}. Programadas para revisión en esta pasada: {len(to_check)}.")
+
+    feed = {"generado": datetime.now().isoformat(timespec="seconds"), "added": [], "modified": [], "removed": []}
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    removed_urls = set()
+
+    for i, url in enumerate(to_check):
+        url_state = state[url]
+        print(f"--- Revisando {i+1}/{len(to_check)}: {url.split('/')[-1]}")
+        status, soup, validators = check_url(session, url, url_state)
+        if status == "error":
+            continue
+
+        url_state["ultima_revision"] = time.time()
+        url_state["revisiones"] += 1
+
+        if status == "removed":
+            if url in tramites:
+                del tramites[url]
+                feed["removed"].append(url)
+            del state[url]
+            removed_urls.add(url)
+        elif status == "modified" or url not in tramites:
+            details = parse_tramite_details(soup, url) if soup is not None else None
+            if details and details["Nombre_Tramite"] != "No disponible":
+                is_new = url not in tramites
+                tramites[url] = details
+                if is_new:
+                    feed["added"].append(url)
+                else:
+                    url_state["cambios"] += 1
+                    feed["modified"].append(url)
+                url_state.update(validators or {})
+            else:
+                # Sin validadores nuevos: la próxima pasada vuelve a detectar el cambio
+                print(f"  -> No se pudo extraer {url}; se reintentará en la próxima pasada.")
+        elif validators:
+            url_state.update(validators)
+
+        if (i + 1) % 20 == 0: # Guardado progresivo del estado
+            save_json(state_file, state)
+        time.sleep(delay)
+
+    save_json(corpus_file, list(tramites.values()))
+    # Reflejamos los mismos cambios en el corpus compacto, sólo si ya existe: crearlo aquí
+    # dejaría un corpus con únicamente los trámites de esta pasada
+    if os.path.exists(corpus_db):
+        with CorpusTramites(corpus_db) as corpus:
+            corpus.put_many(tramites[url] for url in feed["added"] + feed["modified"])
+            for url in feed["removed"]:
+                corpus.delete(url)
+    else:
+        print(f"No existe el corpus compacto '{corpus_db}'; no se actualiza (créalo con corpus_tramites.py importar).")
+    save_json(state_file, state)
+    # El feed se acumula con el pendiente: ingest_dinamico.py --cambios lo borra al aplicarlo
+    pending = merge_feed(load_json(feed_file, {}), feed)
+    save_json(feed_file, pending)
+    if removed_urls & set(discovered_urls):
+        # Las páginas eliminadas salen de la lista de URLs para no volver a sembrarse en cada pasada
+        save_json(urls_file, [url for url in discovered_urls if url not in removed_urls])
+
+    print(f"\n¡Recrawl completado! Nuevos: {len(feed['added'])}, modificados: {len(feed['modified'])}, eliminados: {len(feed['removed'])}.")
+    print(f"Feed de cambios guardado en '{feed_file}' (pendientes de ingestar: {len(pending['added'])} nuevos, "
+          f"{len(pending['modified'])} modificados, {len(pending['removed'])} eliminados). Corpus actualizado en '{corpus_file}'.")
+    return feed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recrawl incremental de trámites priorizado por antigüedad y frecuencia de cambio.",
+        epilog="Ejemplo: python recrawl_incremental.py --max 300 && python ingest_dinamico.py tramites_extraidos_LISTA.json --cambios cambios_tramites.json"
+    )
+    parser.add_argument("--corpus", default=CORPUS_FILE, help="Archivo JSON de trámites que se actualiza en sitio.")
+    parser.add_argument("--urls", default=URLS_CHECKPOINT_FILE, help="Archivo JSON con las URLs descubiertas.")
+    parser.add_argument("--estado", default=STATE_FILE, help="Archivo donde se guarda el historial de revisiones.")
+    parser.add_argument("--salida", default=CHANGE_FEED_FILE, help="Archivo donde se escribe el feed de cambios.")
+    parser.add_argument("--max", type=int, default=None, help="Máximo de URLs a revisar en esta pasada.")
+    parser.add_argument("--umbral", type=float, default=0.0, help="Prioridad mínima (0-1) para revisar una URL.")
+    args = parser.parse_args()
+
+    run_recrawl(
+        corpus_file=args.corpus, urls_file=args.urls, state_file=args.estado,
+        feed_file=args.salida, limit=args.max, min_priority=args.umbral
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# render_ligero.py
+# Modo de "render ligero" para Selenium: los scrapers sólo leen el DOM, así que
+# bloqueamos imágenes, fuentes, CSS y trackers, y no esperamos a la carga completa.
+
+import os
+
+# Se activa con SCRAPER_LEAN_RENDER=1 (desactivado por defecto)
+LEAN_RENDER = os.getenv("SCRAPER_LEAN_RENDER", "0") == "1"
+
+# Patrones para Network.setBlockedURLs de DevTools (admite comodines '*')
+BLOCKED_URL_PATTERNS = [
+    # Imágenes y multimedia
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico", "*.bmp",
+    "*.mp4", "*.webm", "*.mp3",
+    # Fuentes
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    # Hojas de estilo
+    "*.css",
+    # Analítica y trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*clarity.ms*",
+]
+
+def apply_lean_options(chrome_options):
+    """Añade a las opciones de Chrome lo necesario para un render mínimo."""
+    # 'eager' devuelve el control en DOMContentLoaded, sin esperar imágenes ni subrecursos
+    chrome_options.page_load_strategy = "eager"
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+    })
+    return chrome_options
+
+def block_heavy_resources(driver):
+    """Bloquea por DevTools las peticiones de recursos pesados en un driver ya creado."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
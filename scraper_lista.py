@@ -10,6 +10,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
+from render_ligero import LEAN_RENDER, apply_lean_options, block_heavy_resources
+from corpus_tramites import CorpusTramites
 
 BASE_URL = "https://www.gob.ec"
 LIST_URL = f"{BASE_URL}/tramites/lista"
@@ -25,9 +27,13 @@ def get_tramite_urls(max_pages=500):
     chrome_options.add_argument("--headless")  # Ejecutar en segundo plano sin abrir una ventana
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
+    if LEAN_RENDER:
+        apply_lean_options(chrome_options)
     
     # Instala y configura el driver de Chrome automáticamente
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    if LEAN_RENDER:
+        block_heavy_resources(driver)
     
     tramite_urls = set()
     print(f"Iniciando recolección de URLs de trámites...")
@@ -65,6 +71,49 @@ def get_tramite_urls(max_pages=500):
     print(f"Recolección finalizada. Total de URLs únicas encontradas: {len(tramite_urls)}")
     return list(tramite_urls)
 
+def parse_tramite_details(soup, tramite_url):
+    """Extrae los campos de un trámite a partir del HTML ya descargado (BeautifulSoup)."""
+    def get_text_safely(selector):
+        element = soup.select_one(selector)
+        return element.get_text(strip=True) if element else "No disponible"
+
+    def get_section_content_as_text(section_id):
+        start_tag = soup.find(id=section_id)
+        if not start_tag: return "No disponible"
+        content_html = []
+        for sibling in start_tag.find_next_siblings():
+            if (sibling.name == 'div' and 'panel' in sibling.get('class', [])) or \
+               (sibling.name == 'h3' and sibling.has_attr('id')):
+                break
+            content_html.append(str(sibling))
+        if content_html:
+            return BeautifulSoup("".join(content_html), "html.parser").get_text(separator='\n', strip=True)
+        return "No disponible"
+
+    tramite_data = {
+        "Nombre_Tramite": get_text_safely("h1.page-header"),
+        "Institucion_Responsable": get_text_safely("div.alert-info a"),
+        "URL_Fuente": tramite_url,
+        "Descripcion": get_text_safely("div#description"),
+        "A_Quien_Dirigido": get_section_content_as_text("beneficiary"),
+        "Que_Obtendre": get_text_safely("div.panel-success .panel-body"),
+        "Requisitos": get_section_content_as_text("requirements"),
+        "Como_Hacer_Tramite": get_section_content_as_text("steps"),
+        "Costo": get_section_content_as_text("money"),
+        "Ubicacion_Horarios": get_section_content_as_text("location"),
+        "Base_Legal": get_text_safely("div#panel-legal"),
+        "Fecha_Actualizacion": get_text_safely("div.text-right > p").replace("Fecha de última actualización:", "").strip()
+    }
+    
+    canales_atencion = "No disponible"
+    for p_tag in soup.find_all('p'):
+        if 'Canales de atención:' in p_tag.get_text():
+            canales_atencion = p_tag.get_text(strip=True).replace('Canales de atención:', '').strip()
+            break
+    tramite_data["Canales_Atencion"] = canales_atencion
+    
+    return tramite_data
+
 def scrape_tramite_details(tramite_url):
     """Extrae los detalles de una página de trámite individual."""
     print(f"Extrayendo: {tramite_url.split('/')[-1]}")
@@ -72,47 +121,7 @@ def scrape_tramite_details(tramite_url):
         response = requests.get(tramite_url, headers=HEADERS, timeout=20)
         response.raise_for_status()
         soup = BeautifulSoup(response.content, 'html.parser')
-
-        def get_text_safely(selector):
-            element = soup.select_one(selector)
-            return element.get_text(strip=True) if element else "No disponible"
-
-        def get_section_content_as_text(section_id):
-            start_tag = soup.find(id=section_id)
-            if not start_tag: return "No disponible"
-            content_html = []
-            for sibling in start_tag.find_next_siblings():
-                if (sibling.name == 'div' and 'panel' in sibling.get('class', [])) or \
-                   (sibling.name == 'h3' and sibling.has_attr('id')):
-                    break
-                content_html.append(str(sibling))
-            if content_html:
-                return BeautifulSoup("".join(content_html), "html.parser").get_text(separator='\n', strip=True)
-            return "No disponible"
-
-        tramite_data = {
-            "Nombre_Tramite": get_text_safely("h1.page-header"),
-            "Institucion_Responsable": get_text_safely("div.alert-info a"),
-            "URL_Fuente": tramite_url,
-            "Descripcion": get_text_safely("div#description"),
-            "A_Quien_Dirigido": get_section_content_as_text("beneficiary"),
-            "Que_Obtendre": get_text_safely("div.panel-success .panel-body"),
-            "Requisitos": get_section_content_as_text("requirements"),
-            "Como_Hacer_Tramite": get_section_content_as_text("steps"),
-            "Costo": get_section_content_as_text("money"),
-            "Ubicacion_Horarios": get_section_content_as_text("location"),
-            "Base_Legal": get_text_safely("div#panel-legal"),
-            "Fecha_Actualizacion": get_text_safely("div.text-right > p").replace("Fecha de última actualización:", "").strip()
-        }
-        
-        canales_atencion = "No disponible"
-        for p_tag in soup.find_all('p'):
-            if 'Canales de atención:' in p_tag.get_text():
-                canales_atencion = p_tag.get_text(strip=True).replace('Canales de atención:', '').strip()
-                break
-        tramite_data["Canales_Atencion"] = canales_atencion
-        
-        return tramite_data
+        return parse_tramite_details(soup, tramite_url)
 
     except requests.exceptions.RequestException as e:
         print(f"  -> Error al extraer detalles de {tramite_url}: {e}")
@@ -133,6 +142,9 @@ if __name__ == "__main__":
         output_filename = "tramites_extraidos_LISTA.json"
         with open(output_filename, 'w', encoding='utf-8') as f:
             json.dump(all_tramites, f, ensure_ascii=False, indent=4)
+
+        with CorpusTramites() as corpus:
+            corpus.put_many(all_tramites)
         
-        print(f"\n¡PROCESO COMPLETADO! Se han guardado {len(all_tramites)} trámites en '{output_filename}'.")
+        print(f"\n¡PROCESO COMPLETADO! Se han guardado {len(all_tramites)} trámites en '{output_filename}' y en el corpus compacto.")
 
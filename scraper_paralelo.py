@@ -0,0 +1,175 @@
+# scraper_paralelo.py
+# Pool de navegadores headless para la búsqueda por palabras clave.
+# Reparte trabajos (palabra clave, página) entre varios Chrome usando esperas explícitas
+# y une los resultados en un único set compartido y sin duplicados.
+
+import os
+import queue
+import threading
+import time
+from urllib.parse import quote
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+BASE_URL = "https://www.gob.ec"
+SEARCH_URL_TEMPLATE = f"{BASE_URL}/tramites/buscar?search_api_fulltext={{keyword}}&page={{page}}"
+
+# Selectores combinados para manejar inconsistencias en el HTML de los resultados
+RESULT_SELECTOR = "h3.field-content a, div.listing-boxes-text h3 a"
+
+# Tamaño del pool y número de páginas que atiende un navegador antes de reciclarlo
+POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "4"))
+RECYCLE_AFTER_PAGES = int(os.getenv("SCRAPER_RECYCLE_AFTER", "50"))
+WAIT_TIMEOUT = 15
+# Reintentos de una página que falla (con un navegador nuevo) antes de pasar a la siguiente
+MAX_PAGE_RETRIES = 1
+
+def _quit_driver(driver):
+    """Cierra un navegador ignorando errores (por ejemplo, si ya se había caído)."""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def _search_worker(worker_id, driver, driver_factory, jobs, url_set, lock, stats,
+                   max_pages_per_keyword, recycle_after):
+    """Consume trabajos (palabra clave, página, intento) hasta recibir la señal de parada (None)."""
+    pages_on_driver = 0
+    worker_stats = stats[worker_id]
+    worker_stats["inicio"] = time.monotonic()
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            jobs.task_done()
+            break
+
+        keyword, page_num, attempt = job
+        try:
+            # Reciclamos el navegador cada N páginas para acotar el crecimiento de memoria
+            if driver is None or pages_on_driver >= recycle_after:
+                if driver is not None:
+                    print(f"[worker {worker_id}] Reciclando navegador tras {pages_on_driver} páginas.")
+                    _quit_driver(driver)
+                    worker_stats["reciclajes"] += 1
+                driver = driver_factory()
+                pages_on_driver = 0
+
+            search_url = SEARCH_URL_TEMPLATE.format(keyword=quote(keyword), page=page_num)
+            pages_on_driver += 1
+            driver.get(search_url)
+
+            # Espera explícita: hasta WAIT_TIMEOUT segundos a que aparezca el primer resultado
+            try:
+                WebDriverWait(driver, WAIT_TIMEOUT).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, RESULT_SELECTOR))
+                )
+            except TimeoutException:
+                print(f"[worker {worker_id}] Sin resultados para '{keyword}' en la página {page_num + 1}.")
+                continue
+            finally:
+                worker_stats["paginas"] += 1
+
+            hrefs = [link.get_attribute('href') for link in driver.find_elements(By.CSS_SELECTOR, RESULT_SELECTOR)]
+
+            found_new = False
+            with lock:
+                for full_url in hrefs:
+                    if full_url and full_url.startswith(BASE_URL) and full_url not in url_set:
+                        url_set.add(full_url)
+                        found_new = True
+                total = len(url_set)
+
+            print(f"[worker {worker_id}] '{keyword}' página {page_num + 1}: {len(hrefs)} URLs. Total acumulado: {total}")
+
+            # La siguiente página sólo se encola si ésta aportó algo nuevo
+            if hrefs and (found_new or page_num == 0) and page_num + 1 < max_pages_per_keyword:
+                jobs.put((keyword, page_num + 1, 0))
+
+        except Exception as e:
+            worker_stats["errores"] += 1
+            print(f"[worker {worker_id}] Error al procesar '{keyword}' página {page_num + 1}: {e}")
+            # Un navegador que falla se descarta para que el siguiente trabajo use uno nuevo
+            if driver is not None:
+                _quit_driver(driver)
+                driver = None
+            # La paginación de la palabra clave no se corta: se reintenta la página o se pasa a la siguiente
+            if attempt < MAX_PAGE_RETRIES:
+                jobs.put((keyword, page_num, attempt + 1))
+            elif page_num + 1 < max_pages_per_keyword:
+                jobs.put((keyword, page_num + 1, 0))
+        finally:
+            jobs.task_done()
+
+    worker_stats["fin"] = time.monotonic()
+    if driver is not None:
+        _quit_driver(driver)
+
+def get_tramite_urls_parallel(keywords, driver_factory, pool_size=POOL_SIZE,
+                              max_pages_per_keyword=20, recycle_after=RECYCLE_AFTER_PAGES,
+                              url_set=None):
+    """
+    Recopila URLs de trámites repartiendo la búsqueda por palabras clave entre un pool de navegadores.
+    Devuelve el set compartido (deduplicado) con todas las URLs encontradas.
+    """
+    if url_set is None:
+        url_set = set()
+    pool_size = max(1, min(pool_size, len(keywords))) if keywords else 1
+
+    jobs = queue.Queue()
+    for keyword in keywords:
+        jobs.put((keyword, 0, 0))
+
+    lock = threading.Lock()
+    stats = {
+        worker_id: {"paginas": 0, "errores": 0, "reciclajes": 0, "inicio": None, "fin": None}
+        for worker_id in range(pool_size)
+    }
+
+    # Los navegadores iniciales se crean en secuencia para no descargar el driver en paralelo
+    print(f"Iniciando pool de {pool_size} navegadores (reciclaje cada {recycle_after} páginas)...")
+    drivers = []
+    for _ in range(pool_size):
+        try:
+            drivers.append(driver_factory())
+        except Exception as e:
+            print(f"No se pudo iniciar un navegador del pool: {e}")
+            drivers.append(None)
+
+    workers = []
+    for worker_id, driver in enumerate(drivers):
+        worker = threading.Thread(
+            target=_search_worker,
+            args=(worker_id, driver, driver_factory, jobs, url_set, lock, stats,
+                  max_pages_per_keyword, recycle_after),
+            daemon=True,
+        )
+        worker.start()
+        workers.append(worker)
+
+    jobs.join()
+    for _ in workers:
+        jobs.put(None)
+    for worker in workers:
+        worker.join()
+
+    print_pool_report(stats)
+    print(f"\nRecolección paralela finalizada. Total de URLs únicas encontradas: {len(url_set)}")
+    return url_set
+
+def print_pool_report(stats):
+    """Muestra las páginas por minuto de cada worker del pool."""
+    print("\n--- Rendimiento del pool de navegadores ---")
+    total_pages = 0
+    for worker_id, worker_stats in sorted(stats.items()):
+        elapsed = (worker_stats["fin"] or time.monotonic()) - (worker_stats["inicio"] or time.monotonic())
+        pages_per_min = worker_stats["paginas"] / (elapsed / 60) if elapsed > 0 else 0.0
+        total_pages += worker_stats["paginas"]
+        print(
+            f"Worker {worker_id}: {worker_stats['paginas']} páginas en {elapsed:.1f}s "
+            f"({pages_per_min:.1f} páginas/min), {worker_stats['errores']} errores, "
+            f"{worker_stats['reciclajes']} reciclajes"
+        )
+    print(f"Total: {total_pages} páginas procesadas.")
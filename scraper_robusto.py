@@ -8,24 +8,19 @@ import os
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-# <-- CAMBIO: Importaciones necesarias para las esperas inteligentes ---
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-# --- Fin del Cambio ---
 from webdriver_manager.chrome import ChromeDriverManager
-from urllib.parse import quote
 from bs4 import BeautifulSoup
+from scraper_paralelo import get_tramite_urls_parallel
+from render_ligero import LEAN_RENDER, apply_lean_options, block_heavy_resources
+from corpus_tramites import CorpusTramites
 
 BASE_URL = "https://www.gob.ec"
-SEARCH_URL_TEMPLATE = f"{BASE_URL}/tramites/buscar?search_api_fulltext={{keyword}}"
 URLS_CHECKPOINT_FILE = "urls_encontradas.json"
 TRAMITES_OUTPUT_FILE = "tramites_extraidos_COMPLETO.json"
 
-def setup_driver():
-    """Configura e inicializa el driver de Selenium."""
-    print("Configurando el navegador Selenium...")
+def setup_driver(lean_render=LEAN_RENDER):
+    """Configura e inicializa el driver de Selenium. Con `lean_render` bloquea imágenes, fuentes, CSS y trackers."""
+    print(f"Configurando el navegador Selenium{' (render ligero)' if lean_render else ''}...")
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
@@ -33,64 +28,15 @@ def setup_driver():
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option('useAutomationExtension', False)
+    if lean_render:
+        apply_lean_options(chrome_options)
     
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
     driver.set_page_load_timeout(45)
+    if lean_render:
+        block_heavy_resources(driver)
     return driver
 
-def get_tramite_urls(driver, keywords, max_pages_per_keyword=20):
-    """Navega por los resultados de búsqueda y recopila URLs de forma robusta."""
-    tramite_urls = set()
-    print(f"Iniciando recolección de URLs basada en palabras clave...")
-
-    for keyword in keywords:
-        print(f"\n--- Buscando trámites para la palabra clave: '{keyword}' ---")
-        for page_num in range(max_pages_per_keyword):
-            encoded_keyword = quote(keyword)
-            search_url = f"{SEARCH_URL_TEMPLATE.format(keyword=encoded_keyword)}&page={page_num}"
-            
-            print(f"Procesando página de resultados: {page_num + 1}...")
-            
-            try:
-                driver.get(search_url)
-                
-                # --- CAMBIO CRUCIAL: Espera Inteligente ---
-                # En lugar de time.sleep(), esperamos hasta 15 segundos a que el primer resultado aparezca.
-                wait = WebDriverWait(driver, 15)
-                # Usamos un selector más específico que coincide con el HTML que mostraste.
-                selector_resultados = "div.recent-listing-box-container-item h3.field-content a"
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector_resultados)))
-                # --- Fin del Cambio ---
-
-                links = driver.find_elements(By.CSS_SELECTOR, selector_resultados)
-                
-                if not links:
-                    print(f"No se encontraron más enlaces para '{keyword}'. Pasando a la siguiente palabra clave.")
-                    break
-
-                found_new = False
-                for link in links:
-                    full_url = link.get_attribute('href')
-                    if full_url and full_url.startswith(BASE_URL) and full_url not in tramite_urls:
-                        tramite_urls.add(full_url)
-                        found_new = True
-                
-                print(f"Encontradas {len(links)} URLs potenciales. Total acumulado: {len(tramite_urls)}")
-                if not found_new and page_num > 0:
-                    print("Parece que no hay URLs nuevas en esta página, terminando con esta palabra clave.")
-                    break
-
-            except TimeoutException:
-                # Esto ahora significa que después de 15 segundos, la página realmente no cargó resultados.
-                print(f"Timeout esperando resultados para '{keyword}' en la página {page_num + 1}. Pasando a la siguiente.")
-                break
-            except Exception as e:
-                print(f"Error inesperado al procesar la página {page_num + 1} para '{keyword}': {e}")
-                continue
-
-    print(f"\nRecolección finalizada. Total de URLs únicas encontradas: {len(tramite_urls)}")
-    return list(tramite_urls)
-
 # (La función scrape_tramite_details y el resto del script no necesitan cambios)
 def scrape_tramite_details(driver, tramite_url):
     """Extrae los detalles de una página de trámite individual usando Selenium."""
@@ -159,15 +105,16 @@ if __name__ == "__main__":
             # Borramos el archivo para que no vuelva a preguntar si se interrumpe
             os.remove(URLS_CHECKPOINT_FILE) 
 
-    driver = setup_driver()
-    
     if not all_urls:
-        all_urls = get_tramite_urls(driver, keywords=SEARCH_KEYWORDS)
+        # La búsqueda por palabras clave se reparte entre un pool de navegadores (ver scraper_paralelo.py)
+        all_urls = list(get_tramite_urls_parallel(SEARCH_KEYWORDS, driver_factory=setup_driver))
         with open(URLS_CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
             json.dump(all_urls, f, ensure_ascii=False, indent=4)
         print(f"\nSe han guardado {len(all_urls)} URLs en '{URLS_CHECKPOINT_FILE}' como punto de control.")
 
     if all_urls:
+        # El navegador de extracción se crea ahora: durante la recolección sólo trabaja el pool
+        driver = setup_driver()
         all_tramites = []
         # --- MEJORA: Cargar trámites ya procesados para no repetir trabajo ---
         if os.path.exists(TRAMITES_OUTPUT_FILE):
@@ -183,11 +130,16 @@ if __name__ == "__main__":
 
         print(f"URLs totales: {len(all_urls)}. Ya procesadas: {len(processed_urls)}. Pendientes: {len(urls_to_process)}.")
 
+        # Cada trámite se guarda además en el corpus compacto (ver corpus_tramites.py)
+        corpus = CorpusTramites()
+        corpus.put_many(all_tramites)
+
         for i, url in enumerate(urls_to_process):
             print(f"\n--- Procesando Trámite {i+1}/{len(urls_to_process)} (Global {len(processed_urls) + i + 1}/{len(all_urls)}) ---")
             details = scrape_tramite_details(driver, url)
             if details and details["Nombre_Tramite"] != "No disponible":
                 all_tramites.append(details)
+                corpus.put(details)
             
             if (i + 1) % 10 == 0 and all_tramites: # Guardado progresivo
                  print(f"Guardando progreso... {len(all_tramites)} trámites guardados.")
@@ -196,7 +148,7 @@ if __name__ == "__main__":
         
         with open(TRAMITES_OUTPUT_FILE, 'w', encoding='utf-8') as f:
             json.dump(all_tramites, f, ensure_ascii=False, indent=4)
+        corpus.close()
         
         print(f"\n¡PROCESO COMPLETADO! Se han guardado {len(all_tramites)} trámites en '{TRAMITES_OUTPUT_FILE}'.")
-
-    driver.quit()
\ No newline at end of file
+        driver.quit()
\ No newline at end of file
@@ -0,0 +1,176 @@
+# versiones_indice.py
+# Construcciones versionadas del índice ChromaDB.
+# Cada ingesta escribe en un directorio nuevo y, al terminar, se cambia de forma atómica
+# el puntero "CURRENT". main.py detecta el cambio y recarga el retriever sin reiniciarse.
+
+import argparse
+import os
+import shutil
+from datetime import datetime
+
+# --- 1. Configuración ---
+INDEX_ROOT = "tramites_chroma_versiones"
+CURRENT_POINTER = os.path.join(INDEX_ROOT, "CURRENT")
+# Historial de publicaciones (una versión por línea); rollback lo recorre hacia atrás
+HISTORY_FILE = os.path.join(INDEX_ROOT, "HISTORY")
+# Índice antiguo (sin versionar); se usa como respaldo si todavía no hay ninguna versión publicada
+LEGACY_INDEX_PATH = "tramites_chroma_db"
+# Marca que indica que una versión terminó de construirse y puede publicarse
+COMPLETE_MARKER = ".completo"
+# Versiones que se conservan en disco (la actual incluida) para poder hacer rollback
+KEEP_VERSIONS = 3
+
+def new_version_path():
+    """Ruta para una versión nueva (todavía sin crear), nombrada por fecha y hora."""
+    name = datetime.now().strftime("v%Y%m%d-%H%M%S")
+    path = os.path.join(INDEX_ROOT, name)
+    # Tampoco se reutiliza el nombre de una versión ya borrada que siga en el historial
+    used = set(read_history())
+    suffix = 1
+    while os.path.exists(path) or os.path.basename(path) in used:
+        path = os.path.join(INDEX_ROOT, f"{name}-{suffix}")
+        suffix += 1
+    return path
+
+def list_versions():
+    """Versiones completas en disco, de la más antigua a la más reciente."""
+    if not os.path.isdir(INDEX_ROOT):
+        return []
+    return sorted(
+        name for name in os.listdir(INDEX_ROOT)
+        if os.path.isfile(os.path.join(INDEX_ROOT, name, COMPLETE_MARKER))
+    )
+
+def current_version():
+    """Nombre de la versión publicada, o None si no hay ninguna."""
+    try:
+        with open(CURRENT_POINTER, 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+def current_index_path():
+    """Directorio del índice que debe servirse ahora mismo (o None si no existe ninguno)."""
+    version = current_version()
+    if version:
+        return os.path.join(INDEX_ROOT, version)
+    return LEGACY_INDEX_PATH if os.path.exists(LEGACY_INDEX_PATH) else None
+
+def read_history():
+    """
+    Versiones publicadas, de la más antigua a la más reciente; la última es la actual.
+    Sin archivo de historial (índices creados antes de que existiera), se asume el orden por nombre.
+    """
+    try:
+        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        versions = list_versions()
+        current = current_version()
+        return versions[:versions.index(current) + 1] if current in versions else []
+
+def _write_history(history):
+    tmp_path = f"{HISTORY_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("".join(f"{name}\n" for name in history))
+    os.replace(tmp_path, HISTORY_FILE)
+
+def _write_pointer(version, history=None):
+    """
+    Cambia la versión actual. Sin `history`, la versión se añade al historial de publicaciones;
+    rollback pasa el historial ya recortado.
+    """
+    if history is None:
+        history = read_history()
+        if not history or history[-1] != version:
+            history.append(version)
+    _write_history(history)
+    # os.replace es atómico: los lectores ven el puntero viejo o el nuevo, nunca uno a medias
+    tmp_path = f"{CURRENT_POINTER}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, CURRENT_POINTER)
+
+def publish(version_path):
+    """Marca una versión como completa, la convierte en la actual y limpia las antiguas."""
+    version = os.path.basename(os.path.normpath(version_path))
+    with open(os.path.join(version_path, COMPLETE_MARKER), 'w', encoding='utf-8') as f:
+        f.write(datetime.now().isoformat(timespec="seconds"))
+    _write_pointer(version)
+    print(f"Versión '{version}' publicada como índice actual.")
+    prune_old_versions()
+    return version
+
+def discard(version_path):
+    """Elimina una versión que no llegó a completarse."""
+    if os.path.exists(version_path):
+        shutil.rmtree(version_path, ignore_errors=True)
+
+def prune_old_versions(keep=KEEP_VERSIONS):
+    """
+    Borra las versiones que ya no sirven para el rollback: se conservan la actual y las
+    keep-1 publicadas justo antes según el historial (las versiones a medias no se tocan).
+    """
+    kept = []
+    for name in reversed(read_history()):
+        if name not in kept:
+            kept.append(name)
+        if len(kept) == keep:
+            break
+    if current_version() not in kept:
+        return
+    for name in list_versions():
+        if name not in kept:
+            print(f"Eliminando versión antigua '{name}'.")
+            shutil.rmtree(os.path.join(INDEX_ROOT, name), ignore_errors=True)
+
+def rollback():
+    """Vuelve a publicar la versión publicada antes de la actual (según el historial, no por nombre)."""
+    history = read_history()
+    current = current_version()
+    available = set(list_versions())
+    # Se descartan la actual y las entradas cuya versión ya no existe en disco
+    while history and (history[-1] == current or history[-1] not in available):
+        history.pop()
+    if not history:
+        print("No hay una versión anterior a la que volver.")
+        return None
+    previous = history[-1]
+    _write_pointer(previous, history)
+    print(f"Rollback completado: '{current}' -> '{previous}'.")
+    return previous
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gestiona las versiones del índice ChromaDB.",
+        epilog="Ejemplo: python versiones_indice.py rollback"
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    subparsers.add_parser("listar", help="Muestra las versiones disponibles y cuál es la actual.")
+    subparsers.add_parser("rollback", help="Vuelve a la versión publicada antes de la actual.")
+    publicar = subparsers.add_parser("publicar", help="Publica una versión existente como actual.")
+    publicar.add_argument("version", help="Nombre de la versión (p. ej. v20250101-120000).")
+    args = parser.parse_args()
+
+    if args.comando == "listar":
+        current = current_version()
+        versions = list_versions()
+        if not versions:
+            print(f"No hay versiones en '{INDEX_ROOT}'. Índice servido: {current_index_path()}")
+        for name in versions:
+            print(f"{'*' if name == current else ' '} {name}")
+        history = read_history()
+        if history:
+            print(f"Historial de publicaciones: {' -> '.join(history)}")
+    elif args.comando == "rollback":
+        rollback()
+    elif args.comando == "publicar":
+        if args.version not in list_versions():
+            print(f"Error: '{args.version}' no es una versión completa en '{INDEX_ROOT}'.")
+            return
+        _write_pointer(args.version)
+        print(f"Versión '{args.version}' publicada como índice actual.")
+
+if __name__ == "__main__":
+    main()